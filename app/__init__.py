@@ -1,2 +1,14 @@
-"""App package initializer."""
-from . import agent, stt, tts, llm, memory
+"""App package initializer.
+
+Submodules are imported on first access (`app.agent`, `from app import stt`, ...), so
+importing the package does not pull in every stage and its dependencies.
+"""
+import importlib
+
+__all__ = ["agent", "stt", "tts", "llm", "memory"]
+
+
+def __getattr__(name: str):
+    if name in __all__:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
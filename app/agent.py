@@ -1,29 +1,62 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
+import contextvars
+import itertools
 import os
+import threading
 from .stt import transcribe_from_file
-from .tts import speak
-from .tools import retrieval, eligibility, mock_api
+from .tts import speak, speak_all
+from .tools import retrieval, mock_api
 from .memory import Memory
-from . import llm
+from . import decision, llm, tts, tracing
 
-LANG = os.getenv("APP_LANG", "mr")
+# The language (APP_LANG) and the memory store are resolved on first use rather than at
+# import, so importing the agent is cheap and entry points may set APP_LANG afterwards.
+# `agent.LANG`, `agent.MSG` and `agent.mem` still work as module attributes.
+_mem: Optional[Memory] = None
+_mem_lock = threading.Lock()
 
-mem = Memory()
 
-def planner(user_text: str) -> Dict[str, Any]:
-    """Planner: prefer the LLM planner when available, otherwise use a simple heuristic.
+def get_lang() -> str:
+    """Default language for turns that do not specify one."""
+    return os.getenv("APP_LANG", "mr")
 
-    The LLM planner will attempt to return a JSON plan in Telugu (or Marathi depending on `APP_LANG`).
-    """
-    try:
-        plan = llm.plan_with_llm(user_text, lang=LANG)
-        print(f"[Planner] LLM plan: {plan}")
-        if isinstance(plan, dict) and plan.get("action"):
-            return plan
-    except Exception as e:
-        print(f"[Planner] LLM planner failed: {e}")
 
-    # Heuristic fallback: extract keywords and ask retrieval
+def resolve_lang(lang: Optional[str] = None) -> str:
+    """`lang` if supported (None means the default); raises ValueError otherwise."""
+    lang = (lang or get_lang()).lower()
+    if lang not in MESSAGES:
+        raise ValueError(f"Unsupported language: {lang} (supported: {', '.join(SUPPORTED_LANGS)})")
+    return lang
+
+
+def get_memory() -> Memory:
+    """The shared memory store, opened on first use."""
+    global _mem
+    if _mem is None:
+        with _mem_lock:
+            if _mem is None:
+                _mem = Memory()
+    return _mem
+
+
+def set_memory(store: Memory) -> None:
+    """Use `store` instead of the default memory store (tests, benchmarks)."""
+    global _mem
+    _mem = store
+
+
+def __getattr__(name: str):
+    if name == "LANG":
+        return get_lang()
+    if name == "MSG":
+        return messages()
+    if name == "mem":
+        return get_memory()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def heuristic_plan(user_text: str) -> Dict[str, Any]:
+    """Heuristic fallback: extract keywords and ask retrieval."""
     keywords = []
     words = user_text.split()
     # heuristics: pick nouns/words longer than 3 chars
@@ -35,6 +68,66 @@ def planner(user_text: str) -> Dict[str, Any]:
     return plan
 
 
+def is_valid_plan(plan: Any) -> bool:
+    return isinstance(plan, dict) and bool(plan.get("action"))
+
+
+@tracing.traced("planner")
+def planner(user_text: str, lang: Optional[str] = None) -> Dict[str, Any]:
+    """Planner: prefer the LLM planner when available, otherwise use a simple heuristic.
+
+    The LLM planner will attempt to return a JSON plan in Telugu or Marathi (`lang`, default `APP_LANG`).
+    """
+    try:
+        plan = llm.plan_with_llm(user_text, lang=lang or get_lang())
+        print(f"[Planner] LLM plan: {plan}")
+        if is_valid_plan(plan):
+            return plan
+    except Exception as e:
+        print(f"[Planner] LLM planner failed: {e}")
+
+    return heuristic_plan(user_text)
+
+
+class FieldReplyError(ValueError):
+    """An answer for a missing field that could not be parsed."""
+
+
+def apply_field_reply(user_info: Dict[str, Any], field: str, reply: str) -> None:
+    """Store a typed/spoken answer for a missing field in the user profile.
+
+    Raises FieldReplyError when a numeric field's answer is not a number.
+    """
+    try:
+        if field == "age":
+            user_info["age"] = int(reply)
+        elif field == "annual_income":
+            user_info["annual_income"] = int(reply)
+        elif field == "land_size":
+            user_info["land_size"] = float(reply)
+        elif field == "farmer":
+            user_info["farmer"] = reply.strip().lower() in YES_REPLIES
+    except ValueError as e:
+        raise FieldReplyError(f"Invalid answer for {field}: {reply!r}") from e
+
+
+def apply_replies(user_info: Dict[str, Any], fields: List[str], replies: Dict[str, Any]) -> List[str]:
+    """Store the answers actually given for `fields`; missing or blank replies are skipped.
+    Returns the fields that were answered."""
+    answered = []
+    for field in fields:
+        reply = replies.get(field)
+        if reply is None or not str(reply).strip():
+            continue
+        apply_field_reply(user_info, field, str(reply))
+        answered.append(field)
+    return answered
+
+
+# Replies to a yes/no question (farmer) that mean yes
+YES_REPLIES = {"yes", "y", "1", "true", "हो", "होय", "అవును", "ఔను"}
+
+
 # Language-specific messages
 MESSAGES = {
     "mr": {
@@ -56,127 +149,343 @@ MESSAGES = {
         "enter_field_input": "Enter {field} (Telugu / numeric): "
     }
 }
+SUPPORTED_LANGS = tuple(MESSAGES)
+
+
+def messages(lang: Optional[str] = None) -> Dict[str, str]:
+    return MESSAGES.get(lang or get_lang(), MESSAGES["mr"])
+
+
+# Fields the agent may ask for, in decision.FIELDS order; their prompts are fixed strings
+# worth pre-synthesizing
+ASK_FIELDS = list(decision.FIELDS)
+
+
+def ask_prompt(fields: List[str], lang: Optional[str] = None) -> str:
+    """The one prompt asking for all of `fields` (in the order the decision engine gives them)."""
+    return messages(lang)["ask_field"].format(field=", ".join(fields))
+
+
+def static_prompts(lang: Optional[str] = None) -> List[str]:
+    """Spoken messages that do not depend on the conversation (templates without placeholders
+    plus the `ask_field` prompt for every combination of fields the decision engine may ask)."""
+    msgs = messages(lang)
+    prompts = [msgs["no_scheme"], msgs["not_eligible"]]
+    for n in range(1, min(decision.MAX_QUESTIONS, len(ASK_FIELDS)) + 1):
+        prompts += [ask_prompt(list(c), lang) for c in itertools.combinations(ASK_FIELDS, n)]
+    return prompts
 
-MSG = MESSAGES.get(LANG, MESSAGES["mr"])
 
-def executor(plan: Dict[str, Any], user_info: Dict[str, Any]) -> Dict[str, Any]:
+def warm_tts_cache(lang: Optional[str] = None) -> None:
+    """Pre-synthesize the static prompts so they play without a synthesis round-trip."""
+    lang = lang or get_lang()
+    created = tts.presynthesize(static_prompts(lang), lang=lang)
+    print(f"[TTS] Pre-synthesized {created} static prompts for '{lang}'")
+
+
+def preload(langs: Optional[List[str]] = None, warm_tts: bool = False) -> None:
+    """Load the catalog, search index and compiled rules of each language (default: all
+    supported) side by side, so the first turn in any language pays no loading cost."""
+    for lang in langs or SUPPORTED_LANGS:
+        snap = retrieval.get_catalog(lang=resolve_lang(lang)).snapshot()
+        snap.derived("rules", _compile_rules)
+        if SIMILARITY_FALLBACK:
+            from .tools import similarity
+            similarity.for_snapshot(snap)
+        print(f"[Agent] Preloaded {len(snap.schemes)} schemes for '{lang}'")
+        if warm_tts:
+            warm_tts_cache(lang)
+
+# Stop evaluating eligibility once this many eligible schemes were found...
+TOP_K = 1
+# ...or this many schemes that only lack user information (candidates worth asking about)
+SUGGESTIONS = 3
+# Ranked schemes evaluated per vectorized eligibility pass
+EVAL_BATCH = 8
+# Start retrieval + eligibility for the heuristic plan while the LLM plans; the work is
+# kept when the LLM plan agrees (or the LLM misses its budget) and redone otherwise
+SPECULATE = os.getenv("PLAN_SPECULATE", "1") == "1"
+# Speculative runs in flight at once (sync agent); a turn beyond that plans first instead
+# of queueing behind other turns' speculation
+SPECULATE_WORKERS = int(os.getenv("SPECULATE_WORKERS", "8"))
+# Opt-in: when no keyword matches, rank the catalog by TF-IDF similarity to the whole utterance
+SIMILARITY_FALLBACK = os.getenv("RETRIEVAL_SIMILARITY", "0") == "1"
+# Schemes taken from the similarity ranking
+SIMILARITY_TOP_K = 10
+
+
+def _compile_rules(schemes: List[Dict[str, Any]]):
+    # NumPy is only needed once a search runs
+    from .tools import rule_matrix
+    return rule_matrix.compile_rules(schemes)
+
+
+def _similar(snap: retrieval.CatalogSnapshot, query: str) -> List[Tuple[int, float]]:
+    from .tools import similarity
+    hits = similarity.for_snapshot(snap).top_k(query, SIMILARITY_TOP_K)
+    tracing.incr("similarity_hits", len(hits))
+    print(f"[Executor] No keyword match; {len(hits)} schemes similar to the utterance")
+    return hits
+
+
+@tracing.traced("executor")
+def executor(plan: Dict[str, Any], user_info: Dict[str, Any], lang: Optional[str] = None,
+             query: Optional[str] = None, cancel: Optional[threading.Event] = None) -> Dict[str, Any]:
+    """Rank schemes for the plan's keywords and evaluate eligibility in relevance order.
+
+    `query` is the user's utterance; when none of the keywords matches, schemes similar to
+    it are evaluated instead (see SIMILARITY_FALLBACK). Setting `cancel` stops the work at
+    the next eligibility batch.
+    """
     act = plan.get("action")
     if act == "search_schemes":
         kws = plan.get("keywords", [])
         print(f"[Executor] Searching schemes with keywords: {kws}")
-        schemes = retrieval.find_schemes_by_keywords(kws)
+        snap = retrieval.get_catalog(lang=lang or get_lang()).snapshot()
+        rules = snap.derived("rules", _compile_rules)
+        ranked = snap.index.iter_ranked(kws)
+        if query and SIMILARITY_FALLBACK:
+            first = next(ranked, None)
+            ranked = itertools.chain([first], ranked) if first is not None else iter(_similar(snap, query))
         scored = []
-        for s in schemes:
-            res = eligibility.check_eligibility(user_info, s)
-            scored.append({"scheme": s, "eligibility": res})
+        n_eligible = n_suggest = 0
+        done = False
+        # walk schemes in relevance order, evaluating eligibility a batch at a time
+        while not done:
+            if cancel is not None and cancel.is_set():
+                return {"results": scored, "cancelled": True}
+            batch = [i for i, _ in itertools.islice(ranked, EVAL_BATCH)]
+            if not batch:
+                break
+            tracing.incr("eligibility_evals", len(batch))
+            for i, res in zip(batch, rules.evaluate(user_info, batch)):
+                scored.append({"scheme": snap.schemes[i], "eligibility": res})
+                if res["eligible"]:
+                    n_eligible += 1
+                elif res["missing"]:
+                    n_suggest += 1
+                if n_eligible >= TOP_K or n_suggest >= SUGGESTIONS:
+                    done = True
+                    break
         print(f"[Executor] Retrieved {len(scored)} schemes")
         return {"results": scored}
     return {"results": []}
 
+
+def ask_missing(exec_out: Dict[str, Any], user_info: Dict[str, Any]) -> Tuple[decision.DecisionEngine, List[str]]:
+    """Decision engine over all executor candidates and the fields to ask in one prompt."""
+    engine = decision.DecisionEngine([r["scheme"] for r in exec_out.get("results", [])], user_info)
+    return engine, next_questions(engine)
+
+
+def next_questions(engine: decision.DecisionEngine) -> List[str]:
+    """Fields to ask in the next prompt (none once a candidate is eligible or all are decided)."""
+    fields = engine.questions()
+    if fields:
+        tracing.incr("questions_asked", len(fields))
+        print(f"[Decision] Asking for {fields} to decide {len(engine.schemes)} candidates")
+    return fields
+
+
+def rescore(engine: decision.DecisionEngine, fields: List[str]) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+    """Re-check the answered fields for every candidate and select again."""
+    engine.update(fields)
+    exec_out = {"results": engine.results()}
+    return exec_out, evaluator(exec_out).get("selected")
+
+
+def _ask_missing_typed(exec_out: Dict[str, Any], selected: Dict[str, Any], user_info: Dict[str, Any],
+                       user_id: str, lang: str) -> Tuple[Dict[str, Any], Dict[str, Any], bool]:
+    # ask every field that decides a candidate in one prompt, re-score all of them, and ask
+    # again while a candidate is still undecided; the flag is True if the user stopped answering
+    msgs = messages(lang)
+    engine, fields = ask_missing(exec_out, user_info)
+    while fields:
+        speak(ask_prompt(fields, lang), lang=lang)
+        # fallback to typed reply for now; an empty reply skips the field
+        replies = {f: input(msgs["enter_field_input"].format(field=f)) for f in fields}
+        answered = apply_replies(user_info, fields, replies)
+        if not answered:
+            break
+        get_memory().save_user(user_id, user_info)
+        exec_out, selected = rescore(engine, answered)
+        fields = next_questions(engine)
+    return exec_out, selected, still_undecided(engine)
+
+
+def still_undecided(engine: decision.DecisionEngine) -> bool:
+    """True (and logged) when the user left fields unanswered that could still make a
+    candidate eligible; the agent then must not report the user as not eligible."""
+    if engine.pending():
+        print("[Decision] Candidates still undecided; waiting for the missing details")
+        return True
+    return False
+
+
+def plans_agree(a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+    """True when executing either plan gives the same results (same action and the same
+    normalized keywords; ranking does not depend on keyword order)."""
+    def keywords(plan: Dict[str, Any]) -> List[str]:
+        return sorted(retrieval.normalize(str(k)) for k in plan.get("keywords") or [])
+
+    return a.get("action") == b.get("action") and keywords(a) == keywords(b)
+
+
+_spec_pool = None
+_spec_lock = threading.Lock()
+# free worker slots; taken without blocking, so a speculative run never waits for a thread
+_spec_slots = threading.BoundedSemaphore(max(1, SPECULATE_WORKERS))
+
+
+def _speculation_pool():
+    global _spec_pool
+    if _spec_pool is None:
+        with _spec_lock:
+            if _spec_pool is None:
+                from concurrent.futures import ThreadPoolExecutor
+                _spec_pool = ThreadPoolExecutor(max_workers=max(1, SPECULATE_WORKERS), thread_name_prefix="speculate")
+    return _spec_pool
+
+
+def _speculate(*args) -> Dict[str, Any]:
+    try:
+        return executor(*args)
+    finally:
+        _spec_slots.release()
+
+
+def plan_and_execute(user_text: str, user_info: Dict[str, Any], lang: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Planner followed by executor; with SPECULATE, the executor already runs the heuristic
+    plan while the LLM call is in flight (when a speculation worker is free)."""
+    if not SPECULATE or not _spec_slots.acquire(blocking=False):
+        if SPECULATE:
+            tracing.incr("speculation_skipped")
+        plan = planner(user_text, lang)
+        return plan, executor(plan, user_info, lang, query=user_text)
+    # the plan the LLM planner falls back to, so a late LLM always agrees with it
+    guess = llm.fallback_plan(user_text)
+    cancel = threading.Event()
+    ctx = contextvars.copy_context()
+    try:
+        spec = _speculation_pool().submit(ctx.run, _speculate, guess, user_info, lang, user_text, cancel)
+    except BaseException:
+        _spec_slots.release()
+        raise
+    plan = planner(user_text, lang)
+    if plans_agree(plan, guess):
+        tracing.incr("speculation_hit")
+        return plan, spec.result()
+    cancel.set()
+    tracing.incr("speculation_miss")
+    print("[Planner] LLM plan differs from the heuristic plan; re-running the executor")
+    return plan, executor(plan, user_info, lang, query=user_text)
+
+
+@tracing.traced("evaluator")
 def evaluator(executor_out: Dict[str, Any]) -> Dict[str, Any]:
-    # choose best match (eligible true) otherwise return top suggestions
+    # choose best match (eligible true) otherwise a scheme worth asking about, otherwise top suggestion
     results = executor_out.get("results", [])
     eligible = [r for r in results if r["eligibility"]["eligible"]]
     if eligible:
         print(f"[Evaluator] Found eligible schemes: {len(eligible)}")
         return {"selected": eligible[0]}
+    askable = [r for r in results if r["eligibility"]["missing"]]
+    if askable:
+        print("[Evaluator] No eligible schemes yet; asking for details for the best candidate")
+        return {"selected": askable[0]}
     else:
         print(f"[Evaluator] No eligible schemes found; returning top suggestion")
         return {"selected": results[0] if results else None}
 
-def run_agent_on_audio(audio_path: str, user_id: str = "user_1") -> None:
+def run_agent_on_audio(audio_path: str, user_id: str = "user_1", lang: Optional[str] = None) -> None:
+    lang = resolve_lang(lang)
+    with tracing.turn(user_id, mode="audio", lang=lang):
+        _run_on_audio(audio_path, user_id, lang)
+
+
+def _run_on_audio(audio_path: str, user_id: str, lang: str) -> None:
+    msgs = messages(lang)
+    mem = get_memory()
     # Step 1: STT
-    user_text = transcribe_from_file(audio_path, lang=LANG)
+    with tracing.span("stt"):
+        user_text = transcribe_from_file(audio_path, lang=lang)
     mem.add_conversation({"user_id": user_id, "text": user_text})
 
-    # Step 2: Planner
-    plan = planner(user_text)
-
     # Load user info from memory (if any)
     user_info = mem.get_user(user_id)
 
-    # Step 3: Executor
-    exec_out = executor(plan, user_info)
+    # Step 2 + 3: Planner and Executor (overlapping when speculating)
+    plan, exec_out = plan_and_execute(user_text, user_info, lang)
 
     # Step 4: Evaluator
     eval_out = evaluator(exec_out)
 
     selected = eval_out.get("selected")
     if not selected:
-        speak(MSG["no_scheme"], lang=LANG)
+        speak(msgs["no_scheme"], lang=lang)
         return
 
+    if not selected["eligibility"]["eligible"]:
+        exec_out, selected, pending = _ask_missing_typed(exec_out, selected, user_info, user_id, lang)
+        if pending:
+            return
+
     scheme = selected["scheme"]
     elig = selected["eligibility"]
 
-    if not elig["eligible"] and elig["missing"]:
-        # ask for missing information
-        for field in elig["missing"]:
-            msg = MSG["ask_field"].format(field=field)
-            speak(msg, lang=LANG)
-            # fallback to typed reply for now
-            reply = input(MSG["enter_field_input"].format(field=field))
-            if field == "age":
-                user_info["age"] = int(reply)
-            elif field == "annual_income":
-                user_info["annual_income"] = int(reply)
-            elif field == "land_size":
-                user_info["land_size"] = float(reply)
-        mem.save_user(user_id, user_info)
-        # re-run eligibility for selected scheme
-        elig = eligibility.check_eligibility(user_info, scheme)
-
     if elig["eligible"]:
-        speak(MSG["apply_start"].format(scheme=scheme.get("name")), lang=LANG)
+        speak(msgs["apply_start"].format(scheme=scheme.get("name")), lang=lang)
         resp = mock_api.apply_to_scheme(user_info, scheme)
-        mem.add_conversation({"action": "applied", "result": resp})
-        speak(MSG["apply_success"].format(message=resp.get("message"), id=resp.get("application_id")), lang=LANG)
+        mem.add_conversation({"user_id": user_id, "action": "applied", "result": resp})
+        speak(msgs["apply_success"].format(message=resp.get("message"), id=resp.get("application_id")), lang=lang)
     else:
-        speak(MSG["not_eligible"], lang=LANG)
-        # present alternatives
+        # present alternatives; queued together so synthesis overlaps playback
         alt = exec_out.get("results", [])[:3]
-        for a in alt:
-            speak(MSG["recommend"].format(name=a['scheme']['name'], desc=a['scheme']['description']), lang=LANG)
+        lines = [msgs["not_eligible"]]
+        lines += [msgs["recommend"].format(name=a['scheme']['name'], desc=a['scheme']['description']) for a in alt]
+        speak_all(lines, lang=lang)
+
 
+def run_agent_on_text(user_text: str, user_id: str = "user_1", lang: Optional[str] = None) -> None:
+    """Run the agent pipeline directly on text (useful for demos when STT is not used).
 
-def run_agent_on_text(user_text: str, user_id: str = "user_1") -> None:
-    """Run the agent pipeline directly on text (useful for demos when STT is not used)."""
+    `lang` selects the catalog, planner prompt, messages and voice for this turn
+    (default: `APP_LANG`).
+    """
+    lang = resolve_lang(lang)
+    with tracing.turn(user_id, mode="text", lang=lang):
+        _run_on_text(user_text, user_id, lang)
+
+
+def _run_on_text(user_text: str, user_id: str, lang: str) -> None:
+    msgs = messages(lang)
+    mem = get_memory()
     print(f"[Run] Running agent on text: {user_text}")
     mem.add_conversation({"user_id": user_id, "text": user_text})
-    plan = planner(user_text)
     user_info = mem.get_user(user_id)
-    exec_out = executor(plan, user_info)
+    plan, exec_out = plan_and_execute(user_text, user_info, lang)
     eval_out = evaluator(exec_out)
 
     selected = eval_out.get("selected")
     if not selected:
-        speak(MSG["no_scheme"], lang=LANG)
+        speak(msgs["no_scheme"], lang=lang)
         return
 
+    if not selected["eligibility"]["eligible"]:
+        exec_out, selected, pending = _ask_missing_typed(exec_out, selected, user_info, user_id, lang)
+        if pending:
+            return
+
     scheme = selected["scheme"]
     elig = selected["eligibility"]
 
-    if not elig["eligible"] and elig["missing"]:
-        for field in elig["missing"]:
-            msg = MSG["ask_field"].format(field=field)
-            speak(msg, lang=LANG)
-            reply = input(MSG["enter_field_input"].format(field=field))
-            if field == "age":
-                user_info["age"] = int(reply)
-            elif field == "annual_income":
-                user_info["annual_income"] = int(reply)
-            elif field == "land_size":
-                user_info["land_size"] = float(reply)
-        mem.save_user(user_id, user_info)
-        elig = eligibility.check_eligibility(user_info, scheme)
-
     if elig["eligible"]:
-        speak(MSG["apply_start"].format(scheme=scheme.get("name")), lang=LANG)
+        speak(msgs["apply_start"].format(scheme=scheme.get("name")), lang=lang)
         resp = mock_api.apply_to_scheme(user_info, scheme)
-        mem.add_conversation({"action": "applied", "result": resp})
-        speak(MSG["apply_success"].format(message=resp.get("message"), id=resp.get("application_id")), lang=LANG)
+        mem.add_conversation({"user_id": user_id, "action": "applied", "result": resp})
+        speak(msgs["apply_success"].format(message=resp.get("message"), id=resp.get("application_id")), lang=lang)
     else:
-        speak(MSG["not_eligible"], lang=LANG)
         alt = exec_out.get("results", [])[:3]
-        for a in alt:
-            speak(MSG["recommend"].format(name=a['scheme']['name'], desc=a['scheme']['description']), lang=LANG)
+        lines = [msgs["not_eligible"]]
+        lines += [msgs["recommend"].format(name=a['scheme']['name'], desc=a['scheme']['description']) for a in alt]
+        speak_all(lines, lang=lang)
@@ -0,0 +1,187 @@
+"""Asyncio variant of the planner -> executor -> evaluator loop.
+
+Behaves like `app.agent.run_agent_on_text` / `run_agent_on_audio`, but every blocking step
+(STT, the LLM call, memory writes, retrieval + eligibility, the application API and TTS)
+is awaited, so one event loop can drive many conversations concurrently.
+
+The LLM call is awaited without occupying a thread. The other blocking steps run on the
+loop's default executor; call `configure_executor` once on the serving loop to size it
+(`AGENT_THREADS`), since asyncio's default is only min(32, cpus + 4) threads.
+"""
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from . import agent, llm, stt, tts, tracing
+from .agent import (get_lang, get_memory, messages, resolve_lang, executor, evaluator, heuristic_plan,
+                    is_valid_plan, plans_agree, apply_replies, ask_missing, ask_prompt, next_questions,
+                    rescore, still_undecided)
+from .tools import mock_api
+
+# Threads for the blocking steps of all turns on one event loop
+THREADS = int(os.getenv("AGENT_THREADS", "64"))
+
+
+def configure_executor(workers: Optional[int] = None) -> ThreadPoolExecutor:
+    """Give the running event loop a default executor of `workers` threads (default
+    `AGENT_THREADS`) for the blocking steps of every turn it drives."""
+    pool = ThreadPoolExecutor(max_workers=workers or THREADS, thread_name_prefix="agent")
+    asyncio.get_running_loop().set_default_executor(pool)
+    return pool
+
+
+# Coroutine answering a question for a missing field: (field, prompt) -> reply text
+AskFn = Callable[[str, str], Awaitable[str]]
+# Coroutine answering several missing fields asked in one prompt: (fields, prompt) -> replies
+AskManyFn = Callable[[List[str], str], Awaitable[Dict[str, str]]]
+# Coroutine delivering agent utterances to the user, in order
+SayFn = Callable[[List[str]], Awaitable[None]]
+
+
+async def ask_typed(field: str, prompt: str) -> str:
+    """Default `ask`: read the reply from stdin without blocking the event loop."""
+    return await asyncio.to_thread(input, prompt)
+
+
+def ask_each(ask: AskFn, lang: Optional[str] = None) -> AskManyFn:
+    """`AskManyFn` that collects the replies one field at a time through `ask`."""
+    async def ask_many(fields: List[str], prompt: str) -> Dict[str, str]:
+        msgs = messages(lang)
+        return {f: await ask(f, msgs["enter_field_input"].format(field=f)) for f in fields}
+    return ask_many
+
+
+async def say_tts(lines: List[str], lang: Optional[str] = None) -> None:
+    """Default `say`: speak through TTS, queuing multiple lines back to back."""
+    lang = lang or get_lang()
+    if len(lines) == 1:
+        await tts.speak_async(lines[0], lang=lang)
+    else:
+        await tts.speak_all_async(lines, lang=lang)
+
+
+async def planner_async(user_text: str, lang: Optional[str] = None) -> Dict[str, Any]:
+    try:
+        with tracing.span("planner"):
+            plan = await llm.plan_with_llm_async(user_text, lang=lang or get_lang())
+        print(f"[Planner] LLM plan: {plan}")
+        if is_valid_plan(plan):
+            return plan
+    except Exception as e:
+        print(f"[Planner] LLM planner failed: {e}")
+    return heuristic_plan(user_text)
+
+
+async def executor_async(plan: Dict[str, Any], user_info: Dict[str, Any], lang: Optional[str] = None,
+                         query: Optional[str] = None) -> Dict[str, Any]:
+    # retrieval and eligibility are CPU-bound; keep them off the event loop
+    return await asyncio.to_thread(executor, plan, user_info, lang, query)
+
+
+async def plan_and_execute_async(user_text: str, user_info: Dict[str, Any],
+                                 lang: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Async `agent.plan_and_execute`: the heuristic plan's executor runs in a worker
+    thread while the LLM plan is awaited. Speculative runs share the sync agent's
+    `SPECULATE_WORKERS` slots; without a free slot the turn plans first."""
+    if not agent.SPECULATE or not agent._spec_slots.acquire(blocking=False):
+        if agent.SPECULATE:
+            tracing.incr("speculation_skipped")
+        plan = await planner_async(user_text, lang)
+        return plan, await executor_async(plan, user_info, lang, query=user_text)
+    guess = llm.fallback_plan(user_text)
+    cancel = threading.Event()
+    # _speculate frees the slot when the run ends, even if its result is discarded
+    spec = asyncio.ensure_future(asyncio.to_thread(agent._speculate, guess, user_info, lang, user_text, cancel))
+    # a discarded run's outcome is not awaited; retrieve it so errors are not reported as unhandled
+    spec.add_done_callback(lambda t: t.cancelled() or t.exception())
+    try:
+        plan = await planner_async(user_text, lang)
+    except BaseException:
+        cancel.set()
+        raise
+    if plans_agree(plan, guess):
+        tracing.incr("speculation_hit")
+        return plan, await spec
+    cancel.set()
+    tracing.incr("speculation_miss")
+    print("[Planner] LLM plan differs from the heuristic plan; re-running the executor")
+    return plan, await executor_async(plan, user_info, lang, query=user_text)
+
+
+async def _respond(user_text: str, user_id: str, ask_many: AskManyFn, say: SayFn, lang: str,
+                   record: bool = True) -> None:
+    msgs = messages(lang)
+    mem = get_memory()
+    if record:
+        await asyncio.to_thread(mem.add_conversation, {"user_id": user_id, "text": user_text})
+    user_info = await asyncio.to_thread(mem.get_user, user_id)
+    plan, exec_out = await plan_and_execute_async(user_text, user_info, lang)
+    eval_out = evaluator(exec_out)
+
+    selected = eval_out.get("selected")
+    if not selected:
+        await say([msgs["no_scheme"]])
+        return
+
+    if not selected["eligibility"]["eligible"]:
+        # one prompt per round, until no candidate is undecided
+        engine, fields = ask_missing(exec_out, user_info)
+        while fields:
+            prompt = ask_prompt(fields, lang)
+            await say([prompt])
+            replies = await ask_many(fields, prompt)
+            # only answers actually given are stored; left-out fields stay unknown
+            answered = apply_replies(user_info, fields, replies)
+            if not answered:
+                break
+            await asyncio.to_thread(mem.save_user, user_id, user_info)
+            exec_out, selected = rescore(engine, answered)
+            fields = next_questions(engine)
+        if still_undecided(engine):
+            return
+
+    scheme = selected["scheme"]
+    elig = selected["eligibility"]
+
+    if elig["eligible"]:
+        await say([msgs["apply_start"].format(scheme=scheme.get("name"))])
+        resp = await mock_api.apply_to_scheme_async(user_info, scheme)
+        await asyncio.to_thread(mem.add_conversation, {"user_id": user_id, "action": "applied", "result": resp})
+        await say([msgs["apply_success"].format(message=resp.get("message"), id=resp.get("application_id"))])
+    else:
+        alt = exec_out.get("results", [])[:3]
+        lines = [msgs["not_eligible"]]
+        lines += [msgs["recommend"].format(name=a['scheme']['name'], desc=a['scheme']['description']) for a in alt]
+        await say(lines)
+
+
+async def run_agent_on_text_async(user_text: str, user_id: str = "user_1",
+                                  ask: Optional[AskFn] = None, say: Optional[SayFn] = None,
+                                  lang: Optional[str] = None, ask_many: Optional[AskManyFn] = None,
+                                  record: bool = True) -> None:
+    """Async counterpart of `run_agent_on_text`.
+
+    Missing fields are asked in one prompt; `ask_many` receives all of them, otherwise
+    `ask` is called once per field. With `record=False` the user text is not added to the
+    history again (a turn repeated with answers filled in).
+    """
+    lang = resolve_lang(lang)
+    print(f"[Run] Running agent on text: {user_text}")
+    with tracing.turn(user_id, mode="text", lang=lang):
+        await _respond(user_text, user_id, ask_many or ask_each(ask or ask_typed, lang),
+                       say or functools.partial(say_tts, lang=lang), lang, record)
+
+
+async def run_agent_on_audio_async(audio_path: str, user_id: str = "user_1",
+                                   ask: Optional[AskFn] = None, say: Optional[SayFn] = None,
+                                   lang: Optional[str] = None, ask_many: Optional[AskManyFn] = None) -> None:
+    """Async counterpart of `run_agent_on_audio`."""
+    lang = resolve_lang(lang)
+    with tracing.turn(user_id, mode="audio", lang=lang):
+        with tracing.span("stt"):
+            user_text = await stt.transcribe_from_file_async(audio_path, lang=lang)
+        await _respond(user_text, user_id, ask_many or ask_each(ask or ask_typed, lang),
+                       say or functools.partial(say_tts, lang=lang), lang)
@@ -0,0 +1,123 @@
+"""Audio front-end for STT: decode once, resample to 16 kHz mono, trim silence.
+
+`prepare(path)` returns a float32 buffer in [-1, 1] at `SAMPLE_RATE`, which Whisper takes
+directly (no second ffmpeg decode) and which `to_wav_bytes` re-encodes for the OpenAI
+fallback. Energy-based voice-activity detection drops leading/trailing silence and
+shortens long pauses, so padded or noisy recordings cost less inference time.
+
+Decoding uses soundfile (libsndfile) and falls back to pydub (ffmpeg) for formats
+libsndfile cannot read.
+"""
+import io
+import os
+import wave
+from pathlib import Path
+from typing import Union
+
+import numpy as np
+
+# Whisper's native input rate
+SAMPLE_RATE = 16000
+
+# Set AUDIO_VAD=0 to pass decoded audio through untrimmed
+VAD = os.getenv("AUDIO_VAD", "1") == "1"
+# Frame length of the energy detector, in seconds
+VAD_FRAME = 0.03
+# A frame is speech when it is this many dB above the estimated noise floor...
+VAD_MARGIN_DB = float(os.getenv("VAD_MARGIN_DB", "10"))
+# ...and above this absolute level (dBFS), so digital silence is never speech
+VAD_FLOOR_DB = -50.0
+# Audio kept around detected speech, and the longest pause kept inside it, in seconds
+VAD_PAD = 0.2
+VAD_MAX_PAUSE = float(os.getenv("VAD_MAX_PAUSE", "0.5"))
+
+
+def decode(path: Union[str, Path]) -> np.ndarray:
+    """Decode an audio file to a mono float32 buffer at SAMPLE_RATE."""
+    try:
+        import soundfile as sf
+        data, rate = sf.read(str(path), dtype="float32", always_2d=True)
+        samples = data.mean(axis=1)
+    except Exception:
+        # mp3/m4a on older libsndfile, or soundfile not installed
+        from pydub import AudioSegment
+        seg = AudioSegment.from_file(str(path)).set_channels(1)
+        rate = seg.frame_rate
+        scale = float(1 << (8 * seg.sample_width - 1))
+        samples = np.array(seg.get_array_of_samples(), dtype=np.float32) / scale
+    return resample(samples, rate)
+
+
+def resample(samples: np.ndarray, rate: int, target: int = SAMPLE_RATE) -> np.ndarray:
+    if rate == target or not len(samples):
+        return samples.astype(np.float32, copy=False)
+    n = int(round(len(samples) * target / rate))
+    # linear interpolation is enough for speech going into a 16 kHz recogniser
+    positions = np.arange(n, dtype=np.float64) * (rate / target)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+def speech_mask(samples: np.ndarray, rate: int = SAMPLE_RATE) -> np.ndarray:
+    """Per-frame boolean mask of frames that look like speech (energy above the noise floor)."""
+    frame = max(1, int(rate * VAD_FRAME))
+    n = len(samples) // frame
+    if n == 0:
+        return np.ones(1, dtype=bool)
+    frames = samples[:n * frame].reshape(n, frame)
+    db = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+    # the quietest frames approximate the background noise of this recording
+    noise = np.percentile(db, 10)
+    return db > max(noise + VAD_MARGIN_DB, VAD_FLOOR_DB)
+
+
+def trim_silence(samples: np.ndarray, rate: int = SAMPLE_RATE) -> np.ndarray:
+    """Drop leading/trailing silence and shorten pauses longer than VAD_MAX_PAUSE."""
+    frame = max(1, int(rate * VAD_FRAME))
+    speech = speech_mask(samples, rate)
+    if not speech.any():
+        # nothing above the noise floor; let the recogniser decide
+        return samples
+    # keep VAD_PAD around every speech frame
+    pad = int(round(VAD_PAD / VAD_FRAME))
+    kept = np.convolve(speech.astype(np.int8), np.ones(2 * pad + 1, dtype=np.int8), mode="same") > 0
+    # cut each gap between kept regions down to VAD_MAX_PAUSE
+    max_gap = int(round(VAD_MAX_PAUSE / VAD_FRAME))
+    first, last = np.flatnonzero(kept)[[0, -1]]
+    gap = 0
+    for i in range(first, last + 1):
+        if kept[i]:
+            gap = 0
+        else:
+            gap += 1
+            kept[i] = gap <= max_gap
+    kept[:first] = False
+    kept[last + 1:] = False
+    # frame mask -> sample mask (a partial frame at the end follows the last full frame)
+    mask = np.repeat(kept, frame)
+    if len(mask) < len(samples):
+        mask = np.concatenate([mask, np.full(len(samples) - len(mask), kept[-1])])
+    return samples[mask[:len(samples)]]
+
+
+def prepare(path: Union[str, Path]) -> np.ndarray:
+    """Decode `path` once and trim it for STT."""
+    samples = decode(path)
+    if VAD:
+        before = len(samples) / SAMPLE_RATE
+        samples = trim_silence(samples)
+        print(f"[Audio] {before:.1f}s decoded, {len(samples) / SAMPLE_RATE:.1f}s after trimming silence")
+    return samples
+
+
+def to_wav_bytes(samples: np.ndarray, rate: int = SAMPLE_RATE) -> io.BytesIO:
+    """16-bit PCM WAV in memory, named so HTTP clients pick the right content type."""
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2")
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(pcm.tobytes())
+    buf.seek(0)
+    buf.name = "audio.wav"
+    return buf
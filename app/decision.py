@@ -0,0 +1,122 @@
+"""Decide which missing profile fields to ask for, across all candidate schemes at once.
+
+The executor returns several ranked candidates, and each may be undecided on different
+fields. `DecisionEngine` keeps, per candidate and per rule field, whether the field passes,
+fails or is unknown. From that it picks every field an undecided candidate still needs: the
+best candidate's first, then the fields needed by the most candidates. The agent asks all of
+them in one prompt instead of one round-trip per field, and asks again while a candidate
+is still undecided, so no scheme is reported as unsuitable before it could be decided.
+
+When the answers arrive, only the answered fields are re-checked for each candidate; the
+other memoized results are reused. The best scheme is then chosen again among all
+candidates, so a scheme that became eligible is not thrown away because another one was
+selected first.
+
+Outcomes agree with `check_eligibility`, except that a missing `farmer` flag counts as
+unknown (and is worth asking about) rather than as "not a farmer".
+"""
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence, Set
+
+# Fields the engine may ask for, in the order they are asked
+FIELDS = ("age", "annual_income", "land_size", "farmer")
+# Most fields asked in one prompt
+MAX_QUESTIONS = len(FIELDS)
+
+PASS, FAIL, UNKNOWN = "pass", "fail", "unknown"
+
+
+def field_status(field: str, rules: Dict[str, Any], user_info: Dict[str, Any]) -> Optional[str]:
+    """PASS/FAIL/UNKNOWN for one rule field, or None when the scheme does not constrain it
+    (same comparisons as `eligibility.check_eligibility`)."""
+    if field == "age":
+        lo, hi = rules.get("min_age"), rules.get("max_age")
+        if not (lo or hi):
+            return None
+        age = user_info.get("age")
+        if age is None:
+            return UNKNOWN
+        return FAIL if (lo and age < lo) or (hi and age > hi) else PASS
+    if field == "annual_income":
+        limit = rules.get("income_below")
+        if not limit:
+            return None
+        inc = user_info.get("annual_income")
+        if inc is None:
+            return UNKNOWN
+        return FAIL if inc > limit else PASS
+    if field == "land_size":
+        limit = rules.get("land_size_max")
+        if limit is None:
+            return None
+        ls = user_info.get("land_size")
+        if ls is None:
+            return UNKNOWN
+        return FAIL if ls > limit else PASS
+    if field == "farmer":
+        if not rules.get("farmer"):
+            return None
+        if "farmer" not in user_info:
+            return UNKNOWN
+        return PASS if user_info.get("farmer") else FAIL
+    raise ValueError(f"Unknown field: {field}")
+
+
+class DecisionEngine:
+    def __init__(self, schemes: Sequence[Dict], user_info: Dict[str, Any]):
+        self.schemes = list(schemes)
+        self.user_info = user_info
+        # memoized field statuses per candidate; only answered fields are invalidated
+        self._status: List[Dict[str, Optional[str]]] = [{} for _ in self.schemes]
+
+    def status(self, i: int, field: str) -> Optional[str]:
+        memo = self._status[i]
+        if field not in memo:
+            rules = self.schemes[i].get("eligibility", {}) or {}
+            memo[field] = field_status(field, rules, self.user_info)
+        return memo[field]
+
+    def unknown(self, i: int) -> Set[str]:
+        return {f for f in FIELDS if self.status(i, f) == UNKNOWN}
+
+    def outcome(self, i: int) -> str:
+        """"eligible", "ineligible" (a known field fails) or "undecided"."""
+        statuses = [self.status(i, f) for f in FIELDS]
+        if FAIL in statuses:
+            return "ineligible"
+        return "undecided" if UNKNOWN in statuses else "eligible"
+
+    def questions(self, max_fields: int = MAX_QUESTIONS) -> List[str]:
+        """Fields to ask in one prompt: none if a candidate is already eligible; otherwise every
+        field an undecided candidate still needs (the best candidate's first, then those
+        needed by the most candidates), up to `max_fields`."""
+        outcomes = [self.outcome(i) for i in range(len(self.schemes))]
+        if "eligible" in outcomes:
+            return []
+        undecided = [self.unknown(i) for i, o in enumerate(outcomes) if o == "undecided"]
+        if not undecided:
+            return []
+        need = Counter(f for u in undecided for f in u)
+        ranked = sorted(need, key=lambda f: (f not in undecided[0], -need[f], FIELDS.index(f)))
+        chosen = set(ranked[:max_fields])
+        return [f for f in FIELDS if f in chosen]
+
+    def pending(self) -> bool:
+        """True while no candidate is eligible but some are still undecided."""
+        outcomes = {self.outcome(i) for i in range(len(self.schemes))}
+        return "eligible" not in outcomes and "undecided" in outcomes
+
+    def update(self, fields: Sequence[str]) -> None:
+        """Re-check `fields` (answered in `user_info`) for every candidate."""
+        for memo in self._status:
+            for f in fields:
+                memo.pop(f, None)
+
+    def results(self) -> List[Dict[str, Any]]:
+        """Executor-style results for all candidates, with `check_eligibility` output."""
+        out = []
+        for i, scheme in enumerate(self.schemes):
+            missing = [f for f in FIELDS if f != "farmer" and self.status(i, f) == UNKNOWN]
+            out.append({"scheme": scheme, "eligibility": {"eligible": self.outcome(i) == "eligible",
+                                                          "missing": missing}})
+        return out
@@ -1,72 +1,287 @@
+import contextvars
 import os
 import json
-from typing import Dict, Any
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Dict, Any, Optional, Tuple
 
-def plan_with_llm(user_text: str, lang: str = "mr") -> Dict[str, Any]:
-    """Request a structured plan from an LLM (OpenAI) in Telugu (or Marathi based on `lang`).
+from . import tracing
+from .tools.retrieval import normalize
 
-    Returns a dict with at least: {"action": str, "keywords": [str]}
-    Falls back to a heuristic planner when no API key is found or on error.
+MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")
+# Alternative OpenAI-compatible endpoint, e.g. a local stand-in for load tests
+BASE_URL = os.getenv("LLM_BASE_URL")
+# Hard timeout of one chat completion request, in seconds
+TIMEOUT = float(os.getenv("LLM_TIMEOUT", "10"))
+# How long a turn waits for the LLM before using the heuristic plan, in seconds
+BUDGET = float(os.getenv("LLM_BUDGET", "2.5"))
+
+PLAN_CACHE_SIZE = int(os.getenv("PLAN_CACHE_SIZE", "2048"))
+PLAN_CACHE_TTL = float(os.getenv("PLAN_CACHE_TTL", "3600"))
+# Optional on-disk tier shared across processes and restarts (SQLite file)
+PLAN_CACHE_PATH = os.getenv("PLAN_CACHE_PATH")
+
+
+def fallback_plan(text: str) -> Dict[str, Any]:
+    """Heuristic plan used when the LLM is unavailable, fails or is too slow."""
+    keywords = [w for w in text.split() if len(w) > 3][:6]
+    return {"action": "search_schemes", "keywords": keywords}
+
+
+class PlanCache:
+    """LRU + TTL cache of LLM plans keyed on (lang, normalized utterance).
+
+    An optional SQLite file acts as a second tier, so greetings and other repeated
+    utterances stay cached across restarts and worker processes.
     """
-    # Heuristic fallback
-    def fallback(text: str) -> Dict[str, Any]:
-        keywords = [w for w in text.split() if len(w) > 3][:6]
-        return {"action": "search_schemes", "keywords": keywords}
 
-    try:
-        import openai
-        from dotenv import load_dotenv
-        load_dotenv()
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            return fallback(user_text)
-        openai.api_key = api_key
-
-        # Choose system prompt based on language
-        lang = (lang or "mr").lower()
-        if lang == "te":
-            system = (
-                "మీరు ఒక ప్లాన్-ఆధారిత ఏజెంట్‌గా వ్యవహరించాలి. వినియోగదారు తెలుగు భాషలో మాట్లాడారు. "
-                "దయచేసి అవుట్‌పుట్ కేవలం JSON గా ఇవ్వండి, నిర్మాణం: {\"action\":..., \"keywords\":[...]}"
-            )
-            prompt = (
-                f"వినియోగదారుని వాక్యం: {user_text}\n\n"
-                "దయచేసి వెంటనే JSON ప్లాన్ ఇవ్వండి: action (search_schemes/apply/ask_info), keywords (తెలుగు పదాల జాబితా)."
-            )
-        else:
-            system = (
-                "आपण एक योजना-निर्मित सहाय्यक आहात. वापरकर्त्याने मराठीत बोलले आहे. "
-                "आउटपुट फक्त JSON मध्ये पाठवा, संरचना द्या: {\"action\":..., \"keywords\":[...]}"
+    def __init__(self, max_size: int = PLAN_CACHE_SIZE, ttl: float = PLAN_CACHE_TTL, path: Optional[str] = PLAN_CACHE_PATH):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS plans (lang TEXT, text TEXT, plan TEXT, ts REAL, PRIMARY KEY (lang, text))"
             )
-            prompt = (
-                f"वापरकर्त्याचे वाक्य: {user_text}\n\n"
-                "कृपया लगेच JSON प्लॅन द्या: action (search_schemes/apply/ask_info), keywords (मराठी शब्द सूची)."
+
+    @staticmethod
+    def key(user_text: str, lang: str) -> Tuple[str, str]:
+        return ((lang or "mr").lower(), normalize(user_text))
+
+    def get(self, user_text: str, lang: str) -> Optional[Dict[str, Any]]:
+        key = self.key(user_text, lang)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now - entry[0] <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return dict(entry[1])
+                del self._entries[key]
+            if self._db is not None:
+                row = self._db.execute("SELECT plan, ts FROM plans WHERE lang = ? AND text = ?", key).fetchone()
+                if row and now - row[1] <= self.ttl:
+                    plan = json.loads(row[0])
+                    self._store(key, row[1], plan)
+                    self.disk_hits += 1
+                    return dict(plan)
+            self.misses += 1
+            return None
+
+    def put(self, user_text: str, lang: str, plan: Dict[str, Any]) -> None:
+        key = self.key(user_text, lang)
+        now = time.time()
+        with self._lock:
+            self._store(key, now, plan)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO plans (lang, text, plan, ts) VALUES (?, ?, ?, ?)",
+                    (key[0], key[1], json.dumps(plan, ensure_ascii=False), now),
+                )
+
+    def _store(self, key: Tuple[str, str], ts: float, plan: Dict[str, Any]) -> None:
+        self._entries[key] = (ts, plan)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses, "size": len(self._entries)}
+
+
+class LLMClient:
+    """OpenAI chat client configured once per process.
+
+    The API key and `.env` are read on first use; with openai>=1 a single client (and its
+    HTTP connection pool) is reused for every request. Each request has a hard timeout.
+    """
+
+    def __init__(self, timeout: float = TIMEOUT):
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._configured = False
+        self._openai = None
+        self._client = None
+        self.api_key: Optional[str] = None
+
+    def _configure(self) -> None:
+        with self._lock:
+            if self._configured:
+                return
+            try:
+                from dotenv import load_dotenv
+                load_dotenv()
+            except ImportError:
+                pass
+            self.api_key = os.getenv("OPENAI_API_KEY")
+            if self.api_key:
+                import openai
+                self._openai = openai
+                if hasattr(openai, "OpenAI"):
+                    self._client = openai.OpenAI(api_key=self.api_key, base_url=BASE_URL,
+                                                 timeout=self.timeout, max_retries=0)
+                else:
+                    openai.api_key = self.api_key
+                    if BASE_URL:
+                        openai.api_base = BASE_URL
+            self._configured = True
+
+    @property
+    def available(self) -> bool:
+        self._configure()
+        return bool(self.api_key)
+
+    def chat(self, system: str, prompt: str) -> str:
+        self._configure()
+        messages = [
+            {"role": "system", "content": system},
+            {"role": "user", "content": prompt},
+        ]
+        if self._client is not None:
+            resp = self._client.chat.completions.create(
+                model=MODEL, messages=messages, temperature=0.2, max_tokens=200,
             )
+            return resp.choices[0].message.content.strip()
+        resp = self._openai.ChatCompletion.create(
+            model=MODEL, messages=messages, temperature=0.2, max_tokens=200, request_timeout=self.timeout,
+        )
+        return resp["choices"][0]["message"]["content"].strip()
+
+
+client = LLMClient()
+plan_cache = PlanCache()
+_pool = ThreadPoolExecutor(max_workers=int(os.getenv("LLM_CONCURRENCY", "8")), thread_name_prefix="llm")
+
 
-        resp = openai.ChatCompletion.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": system},
-                {"role": "user", "content": prompt},
-            ],
-            temperature=0.2,
-            max_tokens=200,
+def _prompts(user_text: str, lang: str) -> Tuple[str, str]:
+    # Choose system prompt based on language
+    lang = (lang or "mr").lower()
+    if lang == "te":
+        system = (
+            "మీరు ఒక ప్లాన్-ఆధారిత ఏజెంట్‌గా వ్యవహరించాలి. వినియోగదారు తెలుగు భాషలో మాట్లాడారు. "
+            "దయచేసి అవుట్‌పుట్ కేవలం JSON గా ఇవ్వండి, నిర్మాణం: {\"action\":..., \"keywords\":[...]}"
         )
-        content = resp["choices"][0]["message"]["content"].strip()
-        # attempt to parse JSON from model output
+        prompt = (
+            f"వినియోగదారుని వాక్యం: {user_text}\n\n"
+            "దయచేసి వెంటనే JSON ప్లాన్ ఇవ్వండి: action (search_schemes/apply/ask_info), keywords (తెలుగు పదాల జాబితా)."
+        )
+    else:
+        system = (
+            "आपण एक योजना-निर्मित सहाय्यक आहात. वापरकर्त्याने मराठीत बोलले आहे. "
+            "आउटपुट फक्त JSON मध्ये पाठवा, संरचना द्या: {\"action\":..., \"keywords\":[...]}"
+        )
+        prompt = (
+            f"वापरकर्त्याचे वाक्य: {user_text}\n\n"
+            "कृपया लगेच JSON प्लॅन द्या: action (search_schemes/apply/ask_info), keywords (मराठी शब्द सूची)."
+        )
+    return system, prompt
+
+
+def _parse_plan(content: str) -> Optional[Dict[str, Any]]:
+    # attempt to parse JSON from model output
+    try:
+        return json.loads(content)
+    except Exception:
+        # If model responds with text, try extracting a JSON substring
+        start = content.find("{")
+        end = content.rfind("}")
+        if start != -1 and end != -1:
+            try:
+                return json.loads(content[start:end+1])
+            except Exception:
+                return None
+    return None
+
+
+def _request_plan(user_text: str, lang: str) -> Optional[Dict[str, Any]]:
+    """Call the LLM and cache a usable plan. Returns None when the output is unusable."""
+    system, prompt = _prompts(user_text, lang)
+    with tracing.span("llm_call"):
+        content = client.chat(system, prompt)
+    plan = _parse_plan(content)
+    if isinstance(plan, dict) and plan.get("action"):
+        plan_cache.put(user_text, lang, plan)
+    return plan
+
+
+def _start_plan(user_text: str, lang: str) -> Tuple[Optional[Dict[str, Any]], Optional[Future]]:
+    """A plan available right away (cached, or the fallback without an API key), or the
+    LLM request submitted to the pool."""
+    cached = plan_cache.get(user_text, lang)
+    if cached is not None:
+        tracing.incr("plan_cache_hit")
+        return cached, None
+    tracing.incr("plan_cache_miss")
+    if not client.available:
+        tracing.incr("llm_fallback")
+        return fallback_plan(user_text), None
+    # run in the caller's context so the LLM span lands in the current turn
+    ctx = contextvars.copy_context()
+    return None, _pool.submit(ctx.run, _request_plan, user_text, lang)
+
+
+def _over_budget(user_text: str) -> Dict[str, Any]:
+    print("[LLM] No plan within budget; using heuristic plan")
+    tracing.incr("llm_timeout")
+    tracing.incr("llm_fallback")
+    return fallback_plan(user_text)
+
+
+def _usable(plan: Optional[Dict[str, Any]], user_text: str) -> Dict[str, Any]:
+    if isinstance(plan, dict):
+        return plan
+    tracing.incr("llm_fallback")
+    return fallback_plan(user_text)
+
+
+def plan_with_llm(user_text: str, lang: str = "mr", budget: Optional[float] = None) -> Dict[str, Any]:
+    """Request a structured plan from an LLM (OpenAI) in Telugu (or Marathi based on `lang`).
+
+    Returns a dict with at least: {"action": str, "keywords": [str]}
+    Repeated utterances are served from the plan cache. Falls back to a heuristic planner
+    when no API key is found, on error, or when the LLM does not answer within `budget`
+    seconds (the request then finishes in the background and still fills the cache).
+    """
+    try:
+        plan, future = _start_plan(user_text, lang)
+        if future is None:
+            return plan
         try:
-            plan = json.loads(content)
+            plan = future.result(timeout=BUDGET if budget is None else budget)
+        except FutureTimeout:
+            return _over_budget(user_text)
+        return _usable(plan, user_text)
+    except Exception:
+        tracing.incr("llm_fallback")
+        return fallback_plan(user_text)
+
+
+async def plan_with_llm_async(user_text: str, lang: str = "mr", budget: Optional[float] = None) -> Dict[str, Any]:
+    """Async `plan_with_llm`. The request runs on the LLM pool and is awaited directly, so a
+    turn waiting for the LLM does not hold a thread of the event loop's executor."""
+    import asyncio  # already loaded by the running event loop
+    try:
+        plan, future = _start_plan(user_text, lang)
+        if future is None:
             return plan
-        except Exception:
-            # If model responds with text, try extracting a JSON substring
-            start = content.find("{")
-            end = content.rfind("}")
-            if start != -1 and end != -1:
-                try:
-                    plan = json.loads(content[start:end+1])
-                    return plan
-                except Exception:
-                    return fallback(user_text)
-        return fallback(user_text)
+        try:
+            # shielded: on timeout the request keeps running and still fills the cache
+            plan = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)),
+                                          BUDGET if budget is None else budget)
+        except asyncio.TimeoutError:
+            return _over_budget(user_text)
+        return _usable(plan, user_text)
     except Exception:
-        return fallback(user_text)
+        tracing.incr("llm_fallback")
+        return fallback_plan(user_text)
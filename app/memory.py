@@ -1,14 +1,57 @@
 import json
+import os
+import sqlite3
+import threading
+import time
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Set, Tuple
 
 MEM_PATH = Path("memory.json")
 
-class Memory:
-    def __init__(self, path: Path = MEM_PATH):
-        self.path = path
+# "sqlite" (default) keeps memory in <path>.db; "json" keeps the legacy whole-file store
+BACKEND = os.getenv("MEMORY_BACKEND", "sqlite")
+
+# History retention per user: turns beyond the newest HISTORY_MAX_TURNS, or older than
+# HISTORY_MAX_AGE_DAYS (0 = no age limit), are folded into the user's summary record
+HISTORY_MAX_TURNS = int(os.getenv("HISTORY_MAX_TURNS", "200"))
+HISTORY_MAX_AGE_DAYS = float(os.getenv("HISTORY_MAX_AGE_DAYS", "0"))
+# Seconds between background compaction passes (0 disables the background thread)
+HISTORY_COMPACT_INTERVAL = float(os.getenv("HISTORY_COMPACT_INTERVAL", "300"))
+# Entries of each kind kept in a summary record
+SUMMARY_KEEP = 20
+
+
+def summarize(summary: Optional[Dict[str, Any]], turns: Iterable[Dict[str, Any]], user_id: str) -> Dict[str, Any]:
+    """Fold `turns` (oldest first) into a user's summary record."""
+    out = summary or {"type": "summary", "user_id": user_id, "turns": 0, "from_ts": None, "to_ts": None,
+                      "applications": [], "recent_texts": []}
+    for t in turns:
+        out["turns"] += 1
+        ts = t.get("ts")
+        if ts is not None:
+            out["from_ts"] = ts if out["from_ts"] is None else min(out["from_ts"], ts)
+            out["to_ts"] = ts if out["to_ts"] is None else max(out["to_ts"], ts)
+        if t.get("action") == "applied":
+            res = t.get("result") or {}
+            out["applications"].append({k: res.get(k) for k in ("scheme_id", "application_id", "status")})
+        elif t.get("text"):
+            out["recent_texts"].append(t["text"])
+    out["applications"] = out["applications"][-SUMMARY_KEEP:]
+    out["recent_texts"] = out["recent_texts"][-SUMMARY_KEEP:]
+    return out
+
+
+def _cutoff(max_age_days: float) -> Optional[float]:
+    return time.time() - max_age_days * 86400 if max_age_days > 0 else None
+
+
+class JSONBackend:
+    """Legacy store: the whole memory lives in one JSON file that is rewritten on every write."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
         if not self.path.exists():
-            self._write({"users": {}, "conversations": []})
+            self._write({"users": {}, "conversations": [], "summaries": {}})
 
     def _read(self) -> Dict[str, Any]:
         with open(self.path, "r", encoding="utf-8") as f:
@@ -29,5 +72,337 @@ class Memory:
 
     def add_conversation(self, turn: Dict[str, Any]):
         data = self._read()
-        data["conversations"].append(turn)
+        data["conversations"].append(dict(turn, ts=turn.get("ts", time.time())))
         self._write(data)
+
+    def get_history(self, user_id: str, limit: int = 20) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+        data = self._read()
+        turns = [t for t in data["conversations"] if t.get("user_id") == user_id]
+        return data.get("summaries", {}).get(user_id), turns[-limit:] if limit > 0 else []
+
+    def compact(self, max_turns: int, max_age_days: float, users: Optional[Set[str]] = None) -> int:
+        data = self._read()
+        cutoff = _cutoff(max_age_days)
+        per_user: Dict[str, List[Dict[str, Any]]] = {}
+        for t in data["conversations"]:
+            per_user.setdefault(t.get("user_id"), []).append(t)
+        summaries = data.setdefault("summaries", {})
+        folded: Set[int] = set()
+        for uid, turns in per_user.items():
+            if uid is None or (users is not None and uid not in users):
+                continue
+            n_old = max(0, len(turns) - max_turns)
+            if cutoff is not None:
+                while n_old < len(turns) and (turns[n_old].get("ts") or cutoff) < cutoff:
+                    n_old += 1
+            if n_old:
+                summaries[uid] = summarize(summaries.get(uid), turns[:n_old], uid)
+                folded.update(id(t) for t in turns[:n_old])
+        if folded:
+            data["conversations"] = [t for t in data["conversations"] if id(t) not in folded]
+            self._write(data)
+        return len(folded)
+
+    def iter_history_users(self, chunk_size: int = 10000) -> Iterator[List[str]]:
+        ids = sorted({t["user_id"] for t in self._read()["conversations"] if t.get("user_id") is not None})
+        for i in range(0, len(ids), chunk_size):
+            yield ids[i:i + chunk_size]
+
+    def iter_users(self, chunk_size: int = 10000) -> Iterator[List[Tuple[str, Dict[str, Any]]]]:
+        items = list(self._read()["users"].items())
+        for i in range(0, len(items), chunk_size):
+            yield items[i:i + chunk_size]
+
+
+class SQLiteBackend:
+    """SQLite store in WAL mode: keyed user table plus an append-only conversation log.
+
+    Writes are single-row inserts/upserts, so a turn costs O(1) regardless of history size,
+    and concurrent processes are serialised by SQLite instead of overwriting each other.
+    The log is indexed by (user_id, id) for history reads and by ts for age-based retention;
+    compacted turns live on as one summary row per user.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS users (
+                user_id TEXT PRIMARY KEY,
+                info TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS conversations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id TEXT,
+                turn TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+            CREATE TABLE IF NOT EXISTS summaries (
+                user_id TEXT PRIMARY KEY,
+                summary TEXT NOT NULL
+            );
+            """
+        )
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(conversations)")}
+        if "ts" not in columns:
+            # stores created before retention existed; their turns have no timestamp
+            self.conn.execute("ALTER TABLE conversations ADD COLUMN ts REAL")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS conversations_user ON conversations (user_id, id)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS conversations_ts ON conversations (ts)")
+        # users written to since the last compaction pass
+        self._dirty: Set[str] = set()
+
+    def save_user(self, user_id: str, info: Dict[str, Any]):
+        with self._lock:
+            self.conn.execute(
+                "INSERT INTO users (user_id, info) VALUES (?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET info = excluded.info",
+                (user_id, json.dumps(info, ensure_ascii=False)),
+            )
+
+    def get_user(self, user_id: str) -> Dict[str, Any]:
+        with self._lock:
+            row = self.conn.execute("SELECT info FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def add_conversation(self, turn: Dict[str, Any]):
+        user_id = turn.get("user_id")
+        with self._lock:
+            self.conn.execute(
+                "INSERT INTO conversations (user_id, turn, ts) VALUES (?, ?, ?)",
+                (user_id, json.dumps(turn, ensure_ascii=False), turn.get("ts", time.time())),
+            )
+            if user_id is not None:
+                self._dirty.add(user_id)
+
+    def get_history(self, user_id: str, limit: int = 20) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+        with self._lock:
+            row = self.conn.execute("SELECT summary FROM summaries WHERE user_id = ?", (user_id,)).fetchone()
+            rows = self.conn.execute(
+                "SELECT turn, ts FROM conversations WHERE user_id = ? ORDER BY id DESC LIMIT ?",
+                (user_id, max(0, limit)),
+            ).fetchall()
+        turns = []
+        for turn, ts in reversed(rows):
+            t = json.loads(turn)
+            if ts is not None:
+                t.setdefault("ts", ts)
+            turns.append(t)
+        return (json.loads(row[0]) if row else None), turns
+
+    def compact(self, max_turns: int, max_age_days: float, users: Optional[Set[str]] = None) -> int:
+        """Fold turns beyond the retention limits into summary rows. Returns turns folded.
+
+        Without `users`, checks the users written to since the last pass plus every user
+        holding turns older than the age limit.
+        """
+        cutoff = _cutoff(max_age_days)
+        if users is None:
+            with self._lock:
+                users, self._dirty = self._dirty, set()
+                if cutoff is not None:
+                    users |= {r[0] for r in self.conn.execute(
+                        "SELECT DISTINCT user_id FROM conversations WHERE ts < ? AND user_id IS NOT NULL", (cutoff,))}
+        folded = 0
+        for user_id in users:
+            # one short transaction per user, so foreground writes are not held up for long
+            with self._lock:
+                folded += self._compact_user(user_id, max_turns, cutoff)
+        return folded
+
+    def iter_history_users(self, chunk_size: int = 10000) -> Iterator[List[str]]:
+        """Yield ids of users with stored turns, in chunks (walks the user_id index)."""
+        last = ""
+        while True:
+            with self._lock:
+                rows = self.conn.execute(
+                    "SELECT DISTINCT user_id FROM conversations WHERE user_id > ? ORDER BY user_id LIMIT ?",
+                    (last, chunk_size),
+                ).fetchall()
+            if not rows:
+                return
+            yield [r[0] for r in rows]
+            last = rows[-1][0]
+
+    def _compact_user(self, user_id: str, max_turns: int, cutoff: Optional[float]) -> int:
+        # newest id that falls outside the count limit
+        row = self.conn.execute(
+            "SELECT id FROM conversations WHERE user_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?",
+            (user_id, max_turns),
+        ).fetchone()
+        last = row[0] if row else 0
+        if cutoff is not None:
+            row = self.conn.execute(
+                "SELECT MAX(id) FROM conversations WHERE user_id = ? AND ts < ?", (user_id, cutoff),
+            ).fetchone()
+            last = max(last, row[0] or 0)
+        if not last:
+            return 0
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = self.conn.execute(
+                "SELECT turn, ts FROM conversations WHERE user_id = ? AND id <= ? ORDER BY id", (user_id, last),
+            ).fetchall()
+            turns = []
+            for turn, ts in rows:
+                t = json.loads(turn)
+                if ts is not None:
+                    t.setdefault("ts", ts)
+                turns.append(t)
+            prev = self.conn.execute("SELECT summary FROM summaries WHERE user_id = ?", (user_id,)).fetchone()
+            summary = summarize(json.loads(prev[0]) if prev else None, turns, user_id)
+            self.conn.execute(
+                "INSERT INTO summaries (user_id, summary) VALUES (?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET summary = excluded.summary",
+                (user_id, json.dumps(summary, ensure_ascii=False)),
+            )
+            self.conn.execute("DELETE FROM conversations WHERE user_id = ? AND id <= ?", (user_id, last))
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return len(turns)
+
+    def iter_users(self, chunk_size: int = 10000) -> Iterator[List[Tuple[str, Dict[str, Any]]]]:
+        """Yield user profiles in chunks, paging by primary key so only one chunk is in memory."""
+        last = ""
+        while True:
+            with self._lock:
+                rows = self.conn.execute(
+                    "SELECT user_id, info FROM users WHERE user_id > ? ORDER BY user_id LIMIT ?",
+                    (last, chunk_size),
+                ).fetchall()
+            if not rows:
+                return
+            yield [(uid, json.loads(info)) for uid, info in rows]
+            last = rows[-1][0]
+
+    # set once a legacy JSON file has been imported; the import runs at most once per store
+    MIGRATED_KEY = "migrated"
+
+    def _migrated(self) -> bool:
+        # earlier versions wrote one "migrated:<path or digest>" marker per imported file
+        return self.conn.execute(
+            "SELECT 1 FROM meta WHERE key = ? OR key LIKE 'migrated:%' LIMIT 1", (self.MIGRATED_KEY,)
+        ).fetchone() is not None
+
+    def import_json(self, json_path: Path) -> bool:
+        """One-shot import of a legacy memory.json. Returns False if this store already imported
+        one. Existing profiles are never overwritten by the file's."""
+        json_path = Path(json_path)
+        with self._lock:
+            if self._migrated():
+                return False
+            with open(json_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                # re-check inside the write transaction in case another process got here first
+                if self._migrated():
+                    self.conn.execute("ROLLBACK")
+                    return False
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO users (user_id, info) VALUES (?, ?)",
+                    [(uid, json.dumps(info, ensure_ascii=False)) for uid, info in data.get("users", {}).items()],
+                )
+                self.conn.executemany(
+                    "INSERT INTO conversations (user_id, turn, ts) VALUES (?, ?, ?)",
+                    [(t.get("user_id"), json.dumps(t, ensure_ascii=False), t.get("ts"))
+                     for t in data.get("conversations", [])],
+                )
+                self.conn.execute("INSERT INTO meta (key, value) VALUES (?, ?)", (self.MIGRATED_KEY, str(json_path)))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return True
+
+
+def make_backend(path: Path = MEM_PATH, kind: Optional[str] = None):
+    """Create the configured backend for `path`.
+
+    The SQLite backend stores data next to `path` with a `.db` suffix. An existing legacy
+    JSON file at `path` is imported into it once; later changes to that file are ignored.
+    """
+    kind = (kind or BACKEND).lower()
+    path = Path(path)
+    if kind == "json":
+        return JSONBackend(path)
+    if kind == "sqlite":
+        backend = SQLiteBackend(path.with_suffix(".db"))
+        if path.suffix == ".json" and path.exists():
+            if backend.import_json(path):
+                print(f"[Memory] Migrated {path} into {backend.path}")
+        return backend
+    raise ValueError(f"Unknown memory backend: {kind}")
+
+
+class Memory:
+    def __init__(self, path: Path = MEM_PATH, backend=None, max_turns: int = HISTORY_MAX_TURNS,
+                 max_age_days: float = HISTORY_MAX_AGE_DAYS, compact_interval: float = HISTORY_COMPACT_INTERVAL):
+        self.path = path
+        self.backend = backend if backend is not None else make_backend(path)
+        self.max_turns = max_turns
+        self.max_age_days = max_age_days
+        self.compact_interval = compact_interval
+        self._compactor: Optional[threading.Thread] = None
+        self._compactor_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def save_user(self, user_id: str, info: Dict[str, Any]):
+        self.backend.save_user(user_id, info)
+
+    def get_user(self, user_id: str) -> Dict[str, Any]:
+        return self.backend.get_user(user_id)
+
+    def add_conversation(self, turn: Dict[str, Any]):
+        self.backend.add_conversation(turn)
+        if self._compactor is None and self.compact_interval > 0:
+            self._start_compactor()
+
+    def get_history(self, user_id: str, limit: int = 20, include_summary: bool = True) -> List[Dict[str, Any]]:
+        """The user's latest `limit` turns, oldest first.
+
+        With `include_summary`, the summary record of compacted older turns (type
+        "summary") comes first when there is one.
+        """
+        summary, turns = self.backend.get_history(user_id, limit)
+        return ([summary] if include_summary and summary else []) + turns
+
+    def compact(self, users: Optional[Iterable[str]] = None) -> int:
+        """Apply the retention limits now. Returns how many turns were folded into summaries."""
+        folded = self.backend.compact(self.max_turns, self.max_age_days, set(users) if users is not None else None)
+        if folded:
+            print(f"[Memory] Compacted {folded} turns into summaries")
+        return folded
+
+    def iter_history_users(self, chunk_size: int = 10000) -> Iterator[List[str]]:
+        """Yield ids of users with stored turns, in chunks of at most `chunk_size`."""
+        return self.backend.iter_history_users(chunk_size)
+
+    def _start_compactor(self) -> None:
+        def loop():
+            while not self._stop.wait(self.compact_interval):
+                try:
+                    self.compact()
+                except Exception as e:
+                    print(f"[Memory] Compaction failed: {e}")
+
+        with self._compactor_lock:
+            if self._compactor is None:
+                self._compactor = threading.Thread(target=loop, name="memory-compactor", daemon=True)
+                self._compactor.start()
+
+    def stop_compaction(self) -> None:
+        self._stop.set()
+
+    def iter_users(self, chunk_size: int = 10000) -> Iterator[List[Tuple[str, Dict[str, Any]]]]:
+        """Yield (user_id, profile) pairs in chunks of at most `chunk_size`."""
+        return self.backend.iter_users(chunk_size)
@@ -0,0 +1,83 @@
+"""Bulk eligibility screening of stored users against one or more schemes.
+
+Profiles are streamed from the memory store in chunks and each chunk is checked against
+every target scheme with `RuleMatrix.screen_users`, so memory stays bounded by the chunk
+size however many users are stored. Results go to three JSONL files in the output
+directory:
+
+- eligible.jsonl    user qualifies now
+- missing.jsonl     no known field fails, but some required fields are unknown
+                    (with `max_missing=1`: exactly one field away from qualifying)
+- ineligible.jsonl  a known field fails a rule
+- undetermined.jsonl  (with `max_missing`) no known field fails, but more than
+                    `max_missing` fields are unknown; also profiles with values that
+                    cannot be checked (e.g. a non-numeric age), with an "error" key
+"""
+import json
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from .memory import Memory
+from .tools.rule_matrix import RuleMatrix, UserColumns, missing_names
+
+OUTCOMES = ("eligible", "missing", "ineligible", "undetermined")
+
+
+def screen_users(
+    schemes: Sequence[Dict],
+    memory: Memory,
+    out_dir: Union[str, Path],
+    chunk_size: int = 10000,
+    max_missing: Optional[int] = None,
+) -> Dict[str, int]:
+    """Screen every stored user against `schemes`. Returns per-outcome counts."""
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    rules = RuleMatrix(schemes)
+    counts = {k: 0 for k in OUTCOMES}
+    files = {k: open(out / f"{k}.jsonl", "w", encoding="utf-8") for k in OUTCOMES}
+    try:
+        for chunk in memory.iter_users(chunk_size):
+            user_ids = [uid for uid, _ in chunk]
+            profiles = [info for _, info in chunk]
+            cols = UserColumns(profiles)
+            for row, scheme in enumerate(schemes):
+                blocked, missing, invalid = rules.screen_users(profiles, row, cols)
+                n_missing = _popcount(missing)
+                outcome = np.where(blocked, 2, np.where(missing == 0, 0, 1))
+                if max_missing is not None:
+                    # too many unknowns to be worth a call; their eligibility is still unknown
+                    outcome[(outcome == 1) & (n_missing > max_missing)] = 3
+                outcome[invalid] = 3
+                for j in range(len(user_ids)):
+                    kind = OUTCOMES[outcome[j]]
+                    rec = {"user_id": user_ids[j], "scheme_id": scheme.get("id")}
+                    if invalid[j]:
+                        rec["error"] = "profile has values that cannot be checked"
+                    elif missing[j]:
+                        rec["missing"] = missing_names(int(missing[j]))
+                    files[kind].write(json.dumps(rec, ensure_ascii=False) + "\n")
+                    counts[kind] += 1
+    finally:
+        for f in files.values():
+            f.close()
+    print(f"[Screening] {counts} written to {out}")
+    return counts
+
+
+def _popcount(masks: np.ndarray) -> np.ndarray:
+    bits = np.unpackbits(masks.astype(np.uint8)[:, None], axis=1)
+    return bits.sum(axis=1)
+
+
+def select_schemes(schemes: List[Dict], ids: Optional[Sequence[str]]) -> List[Dict]:
+    if not ids:
+        return schemes
+    wanted = set(ids)
+    chosen = [s for s in schemes if s.get("id") in wanted]
+    unknown = wanted - {s.get("id") for s in chosen}
+    if unknown:
+        raise ValueError(f"Unknown scheme ids: {sorted(unknown)}")
+    return chosen
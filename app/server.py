@@ -0,0 +1,154 @@
+"""HTTP serving mode for the agent (FastAPI).
+
+Endpoints:
+- POST /turn   JSON {"text", "user_id", "answers", "lang"} -> agent messages for one text turn
+- POST /audio  multipart upload (file, user_id, lang) -> transcription + agent messages
+- GET  /tts    ?text=&lang= -> mp3 from the shared TTS cache
+- GET  /metrics  per-stage latency histograms and counters (with `TRACE=1`)
+
+Models, scheme catalogs and the TTS cache are process-wide and shared by all requests.
+`lang` is chosen per request (default `APP_LANG`); the catalogs of all languages in
+`SERVER_LANGS` (default: all supported) are loaded side by side at startup, so one worker
+serves mixed-language traffic.
+Each response carries `Server-Timing` and `X-Process-Time` headers. Run several worker
+processes with `python run_server.py --workers N`.
+
+When the agent needs missing fields that are not in `answers`, the turn stops and the
+response has status "need_info" with all the fields to ask for in `fields` (`field` is the
+first of them); the client repeats the turn with the answers filled in, and the repeat is
+not added to the conversation history again.
+"""
+import asyncio
+import os
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+from fastapi import FastAPI, File, Form, HTTPException, Request, UploadFile
+from fastapi.responses import FileResponse, PlainTextResponse
+from pydantic import BaseModel
+
+from . import agent, agent_async, stt, tracing, tts
+
+
+class TurnRequest(BaseModel):
+    text: str
+    user_id: str = "user_1"
+    answers: Dict[str, Union[str, int, float, bool]] = {}
+    lang: Optional[str] = None
+
+
+class NeedInfo(Exception):
+    def __init__(self, fields: List[str]):
+        super().__init__(", ".join(fields))
+        self.fields = fields
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # load shared resources once per worker process, before the first request
+    langs = [l.strip() for l in os.getenv("SERVER_LANGS", "").split(",") if l.strip()]
+    agent.preload(langs or None, warm_tts=os.getenv("SERVER_WARM_TTS", "0") == "1")
+    # blocking steps of all concurrent turns share this executor (AGENT_THREADS)
+    agent_async.configure_executor()
+    if os.getenv("SERVER_PRELOAD_STT", "0") == "1":
+        stt.warm_up()
+    yield
+
+
+app = FastAPI(title="Voice scheme agent", lifespan=lifespan)
+
+
+@app.middleware("http")
+async def timing_headers(request: Request, call_next):
+    start = time.perf_counter()
+    request.state.timings = {}
+    response = await call_next(request)
+    total = (time.perf_counter() - start) * 1000
+    stages = [f"{name};dur={ms:.1f}" for name, ms in request.state.timings.items()]
+    stages.append(f"total;dur={total:.1f}")
+    response.headers["Server-Timing"] = ", ".join(stages)
+    response.headers["X-Process-Time"] = f"{total:.1f}ms"
+    return response
+
+
+def _lang(lang: Optional[str]) -> str:
+    try:
+        return agent.resolve_lang(lang)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+async def _run_turn(request: Request, text: str, user_id: str, answers: Dict[str, Any], lang: str) -> Dict[str, Any]:
+    messages: List[str] = []
+
+    async def say(lines: List[str]) -> None:
+        messages.extend(lines)
+
+    async def ask_many(fields: List[str], prompt: str) -> Dict[str, str]:
+        missing = [f for f in fields if f not in answers]
+        if missing:
+            raise NeedInfo(missing)
+        return {f: str(answers[f]) for f in fields}
+
+    start = time.perf_counter()
+    try:
+        # a turn that carries answers repeats a need_info turn already in the history
+        await agent_async.run_agent_on_text_async(text, user_id, ask_many=ask_many, say=say, lang=lang,
+                                                  record=not answers)
+        out: Dict[str, Any] = {"status": "done"}
+    except NeedInfo as e:
+        out = {"status": "need_info", "field": e.fields[0], "fields": e.fields}
+    except agent.FieldReplyError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    finally:
+        request.state.timings["agent"] = (time.perf_counter() - start) * 1000
+    out.update({"text": text, "lang": lang, "messages": messages})
+    return out
+
+
+@app.post("/turn")
+async def turn(req: TurnRequest, request: Request) -> Dict[str, Any]:
+    return await _run_turn(request, req.text, req.user_id, req.answers, _lang(req.lang))
+
+
+@app.post("/audio")
+async def audio(request: Request, file: UploadFile = File(...), user_id: str = Form("user_1"),
+                lang: Optional[str] = Form(None)) -> Dict[str, Any]:
+    lang = _lang(lang)
+    suffix = Path(file.filename or "").suffix or ".mp3"
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(await file.read())
+        start = time.perf_counter()
+        text = await stt.transcribe_from_file_async(path, lang=lang, interactive=False)
+        request.state.timings["stt"] = (time.perf_counter() - start) * 1000
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    if not text:
+        raise HTTPException(status_code=422, detail="Could not transcribe audio")
+    return await _run_turn(request, text, user_id, {}, lang)
+
+
+@app.get("/tts")
+async def tts_audio(text: str, request: Request, lang: Optional[str] = None):
+    lang = _lang(lang)
+    start = time.perf_counter()
+    try:
+        path = await asyncio.to_thread(tts.synthesize, text, lang)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"TTS failed: {e}")
+    request.state.timings["tts"] = (time.perf_counter() - start) * 1000
+    return FileResponse(str(path), media_type="audio/mpeg")
+
+
+@app.get("/metrics")
+async def metrics() -> PlainTextResponse:
+    """Per-stage latency histograms and counters (Prometheus text format; needs TRACE=1)."""
+    return PlainTextResponse(tracing.prometheus_snapshot())
@@ -1,18 +1,154 @@
+import gc
 import os
-from typing import Optional
+import threading
+from contextlib import contextmanager
+from typing import Any, Optional, Dict, Iterable, List, Union, TYPE_CHECKING
 
-def transcribe_from_file(audio_path: str, lang: str = "mr") -> str:
+from . import tracing
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Whisper model size used for transcription and how many replicas of it may be loaded
+MODEL_NAME = os.getenv("WHISPER_MODEL", "small")
+POOL_SIZE = int(os.getenv("WHISPER_POOL_SIZE", "1"))
+
+
+class _ModelPool:
+    """Up to `size` replicas of one Whisper model, each used by one caller at a time."""
+
+    def __init__(self, name: str, size: int):
+        self.name = name
+        self.size = max(1, size)
+        self.idle: List[Any] = []
+        self.loaded = 0
+        self.cond = threading.Condition()
+
+    def get(self):
+        with self.cond:
+            # wait for an idle replica, or for room to load one (e.g. after a failed load)
+            self.cond.wait_for(lambda: self.idle or self.loaded < self.size)
+            if self.idle:
+                return self.idle.pop()
+            self.loaded += 1
+        try:
+            import whisper
+            print(f"[STT] Loading whisper model '{self.name}'")
+            return whisper.load_model(self.name)
+        except BaseException:
+            with self.cond:
+                self.loaded -= 1
+                self.cond.notify()
+            raise
+
+    def put(self, model) -> None:
+        with self.cond:
+            self.idle.append(model)
+            self.cond.notify()
+
+
+class WhisperModelManager:
+    """Keeps Whisper models resident across calls.
+
+    Each model size is loaded once (per replica) and reused; concurrent callers are
+    serialised per replica, so `POOL_SIZE` bounds both memory and parallel inference.
+    """
+
+    def __init__(self, pool_size: int = POOL_SIZE):
+        self.pool_size = pool_size
+        self._pools: Dict[str, _ModelPool] = {}
+        self._lock = threading.Lock()
+
+    def _pool(self, name: str) -> _ModelPool:
+        pool = self._pools.get(name)
+        if pool is None:
+            with self._lock:
+                pool = self._pools.get(name)
+                if pool is None:
+                    pool = _ModelPool(name, self.pool_size)
+                    self._pools[name] = pool
+        return pool
+
+    @contextmanager
+    def acquire(self, name: Optional[str] = None):
+        pool = self._pool(name or MODEL_NAME)
+        model = pool.get()
+        try:
+            yield model
+        finally:
+            pool.put(model)
+
+    def warm_up(self, names: Optional[Iterable[str]] = None) -> None:
+        """Load the given model sizes (default: the configured one) ahead of the first request."""
+        for name in names or [MODEL_NAME]:
+            with self.acquire(name):
+                pass
+
+    def unload(self, name: Optional[str] = None) -> None:
+        """Drop one model size (or all of them) so its memory can be reclaimed."""
+        with self._lock:
+            if name is None:
+                self._pools.clear()
+            else:
+                self._pools.pop(name, None)
+        gc.collect()
+
+
+models = WhisperModelManager()
+
+
+def warm_up(names: Optional[Iterable[str]] = None) -> None:
+    models.warm_up(names)
+
+
+def unload(name: Optional[str] = None) -> None:
+    models.unload(name)
+
+
+def prepare_audio(audio_path: str):
+    """Decoded, silence-trimmed 16 kHz buffer for `audio_path` (see app.audio).
+
+    Returns the path itself when no decoder is available, so each backend decodes it.
+    """
+    try:
+        from . import audio
+        with tracing.span("audio_preprocess"):
+            return audio.prepare(audio_path)
+    except Exception as e:
+        print(f"[STT] Audio preprocessing unavailable ({e}); passing the file through")
+        return audio_path
+
+
+def transcribe_whisper(audio: Union[str, "np.ndarray"], lang: str = "mr", model_name: Optional[str] = None) -> str:
+    """Transcribe a file path or a 16 kHz float32 buffer with a resident Whisper model.
+
+    Raises if whisper is unavailable or fails.
+    """
+    with models.acquire(model_name) as model, tracing.span("stt_decode"):
+        result = model.transcribe(audio, language=lang)
+    return result.get("text", "").strip()
+
+
+def _openai_file(audio):
+    if isinstance(audio, str):
+        return open(audio, "rb")
+    from .audio import to_wav_bytes
+    return to_wav_bytes(audio)
+
+
+def transcribe_from_file(audio_path: str, lang: str = "mr", interactive: bool = True) -> str:
     """Transcribe audio using Whisper if available, otherwise fallback to asking user to type input.
 
     Returns transcribed text in the target native language (Telugu) when possible.
+    With `interactive=False` (e.g. in a server) an empty string is returned instead of prompting.
     """
+    # decode once; the same buffer goes to whichever backend runs
+    audio = prepare_audio(audio_path)
+
     # Try to use whisper package if installed
     try:
-        import whisper
-        print(f"[STT] Loading whisper model 'small' and transcribing {audio_path} (lang={lang})")
-        model = whisper.load_model("small")
-        result = model.transcribe(audio_path, language=lang)
-        text = result.get("text", "").strip()
+        print(f"[STT] Transcribing {audio_path} with whisper model '{MODEL_NAME}' (lang={lang})")
+        text = transcribe_whisper(audio, lang)
         print(f"[STT] Whisper output: {text}")
         if text:
             return text
@@ -26,8 +162,8 @@ def transcribe_from_file(audio_path: str, lang: str = "mr") -> str:
         load_dotenv()
         if os.getenv("OPENAI_API_KEY"):
             print("[STT] Attempting OpenAI transcription as fallback")
-            audio_file = open(audio_path, "rb")
-            resp = openai.Audio.transcribe("gpt-4o-mini-transcribe", audio_file, language=lang)
+            with _openai_file(audio) as audio_file, tracing.span("stt_openai"):
+                resp = openai.Audio.transcribe("gpt-4o-mini-transcribe", audio_file, language=lang)
             text = resp.get("text", "").strip()
             print(f"[STT] OpenAI transcription output: {text}")
             if text:
@@ -35,6 +171,15 @@ def transcribe_from_file(audio_path: str, lang: str = "mr") -> str:
     except Exception as e:
         print(f"[STT] OpenAI transcription failed: {e}")
 
+    if not interactive:
+        return ""
+
     # here Fallback: ask user to type the transcription (useful for testing)
     print("STT fallback: Please type the user's words in Telugu:")
     return input("Typed user input (Telugu): ")
+
+
+async def transcribe_from_file_async(audio_path: str, lang: str = "mr", interactive: bool = True) -> str:
+    """Run `transcribe_from_file` in a worker thread (decoding and inference block)."""
+    import asyncio  # already loaded by the running event loop
+    return await asyncio.to_thread(transcribe_from_file, audio_path, lang, interactive)
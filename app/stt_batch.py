@@ -0,0 +1,135 @@
+"""Batch transcription of recorded calls over a pool of worker processes.
+
+Each worker loads one Whisper model at start-up and keeps it for its lifetime. Results are
+appended to a JSONL file as soon as each file finishes, so a crashed or interrupted run can
+be resumed: files that already have an "ok" record in the output are skipped.
+"""
+import json
+import multiprocessing as mp
+import os
+import time
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional, Set, Tuple, Union
+
+AUDIO_EXTS = {".mp3", ".wav", ".m4a", ".flac", ".ogg"}
+
+_worker_model: Optional[str] = None
+# why the worker's model failed to load; each file then gets an error record
+_worker_error: Optional[str] = None
+
+
+def iter_inputs(source: Union[str, Path], lang: str = "mr") -> Iterator[Tuple[str, str]]:
+    """Yield (audio_path, lang) pairs from a directory or a manifest file.
+
+    A manifest is either one path per line, or JSONL with a "path" and optional "lang" key.
+    Relative manifest paths are resolved against the manifest's directory.
+    """
+    src = Path(source)
+    if src.is_dir():
+        for p in sorted(src.rglob("*")):
+            if p.suffix.lower() in AUDIO_EXTS:
+                yield str(p), lang
+        return
+    with open(src, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("{"):
+                rec = json.loads(line)
+                path, file_lang = rec["path"], rec.get("lang", lang)
+            else:
+                path, file_lang = line, lang
+            p = Path(path)
+            if not p.is_absolute():
+                p = src.parent / p
+            yield str(p), file_lang
+
+
+def completed_paths(out_path: Union[str, Path]) -> Set[str]:
+    """Paths that already have a successful record in an existing output file."""
+    done: Set[str] = set()
+    p = Path(out_path)
+    if not p.exists():
+        return done
+    with open(p, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                # a line cut short by an interrupted run
+                continue
+            if rec.get("status") == "ok":
+                done.add(rec["path"])
+    return done
+
+
+def _init_worker(model_name: str) -> None:
+    # an exception here would kill the worker and the pool would respawn it forever
+    global _worker_model, _worker_error
+    _worker_model = model_name
+    try:
+        from . import stt
+        stt.warm_up([model_name])
+    except Exception as e:
+        _worker_error = f"model '{model_name}' failed to load: {e}"
+        print(f"[STT-Batch] {_worker_error}")
+
+
+def _work(item: Tuple[str, str]) -> Dict[str, Any]:
+    from . import stt
+    path, lang = item
+    start = time.perf_counter()
+    rec: Dict[str, Any] = {"path": path, "lang": lang}
+    if _worker_error:
+        rec.update(status="error", error=_worker_error, seconds=0.0)
+        return rec
+    try:
+        rec["text"] = stt.transcribe_whisper(stt.prepare_audio(path), lang, _worker_model)
+        rec["status"] = "ok"
+    except Exception as e:
+        rec["status"] = "error"
+        rec["error"] = str(e)
+    rec["seconds"] = round(time.perf_counter() - start, 3)
+    return rec
+
+
+def transcribe_batch(
+    source: Union[str, Path],
+    out_path: Union[str, Path],
+    lang: str = "mr",
+    workers: int = 2,
+    model_name: Optional[str] = None,
+    resume: bool = True,
+) -> Dict[str, int]:
+    """Transcribe every file in `source` into `out_path` (JSONL). Returns ok/error/skipped counts."""
+    from .stt import MODEL_NAME
+    model_name = model_name or MODEL_NAME
+    out = Path(out_path)
+    done = completed_paths(out) if resume else set()
+    items = list(iter_inputs(source, lang))
+    todo: List[Tuple[str, str]] = [it for it in items if it[0] not in done]
+    counts = {"ok": 0, "error": 0, "skipped": len(items) - len(todo)}
+    if not todo:
+        print(f"[STT-Batch] Nothing to do: {counts['skipped']} files already transcribed in {out}")
+        return counts
+
+    mode = "a" if resume else "w"
+    if resume and out.exists() and out.stat().st_size:
+        # make sure a truncated last line does not swallow the first new record
+        with open(out, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            needs_newline = f.read(1) != b"\n"
+        if needs_newline:
+            with open(out, "a", encoding="utf-8") as f:
+                f.write("\n")
+
+    print(f"[STT-Batch] {len(todo)} files, {counts['skipped']} already done, {workers} workers, model '{model_name}'")
+    ctx = mp.get_context("spawn")
+    with open(out, mode, encoding="utf-8") as f, ctx.Pool(workers, initializer=_init_worker, initargs=(model_name,)) as pool:
+        for rec in pool.imap_unordered(_work, todo):
+            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            f.flush()
+            counts[rec["status"]] += 1
+    print(f"[STT-Batch] Finished: {counts}")
+    return counts
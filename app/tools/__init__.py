@@ -1,2 +1,14 @@
-"""Tools package initializer."""
-from . import retrieval, eligibility, mock_api
+"""Tools package initializer.
+
+Submodules are imported on first access; `rule_matrix`, `similarity` and `catalog_file`
+need NumPy, which should not be loaded just to import the package.
+"""
+import importlib
+
+__all__ = ["retrieval", "phonetic", "similarity", "catalog_file", "eligibility", "mock_api", "rule_matrix"]
+
+
+def __getattr__(name: str):
+    if name in __all__:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,305 @@
+"""Compiled scheme catalogs: one memory-mapped file instead of JSON parsed at startup.
+
+`scripts/compile_catalog.py` turns `schemes_xx.json` into `schemes_xx.catalog`. The
+catalog loader (`retrieval.SchemeCatalog`) uses the compiled file when it was compiled
+from the current JSON (same size and mtime), and falls back to the JSON otherwise.
+
+File layout (all sections 64-byte aligned, little endian):
+
+    b"SCHEMCAT" | u32 version | u32 header length | JSON header | sections...
+
+The header lists every section as (offset, dtype, shape). Sections are:
+
+- `str.offsets.<field>` (int64, count + 1) into the shared UTF-8 blob `str.blob`, for
+  id, name, description, application_url and the normalized search text, plus `extra`
+  (the JSON of all remaining record fields, e.g. eligibility). `str.present` is a bitmask
+  of which of the first four fields a record has as a string.
+- `rules.<column>`: the fixed-width eligibility columns of `rule_matrix.RuleMatrix`.
+- `table.<name>.{hashes,indptr,values}`: each posting dict of `retrieval.SchemeIndex`
+  (n-grams, tokens, phonetic keys) as sorted 64-bit key hashes with CSR postings.
+- `sim.{indptr,rows,weights}`: the `similarity.SimilarityIndex` arrays (optional).
+
+Opening a catalog reads only the header. Arrays are views of the mapping, records are
+built from the string section when accessed, and the OS page cache is shared by every
+worker process that maps the same file. The trade-off is query time: keyword lookups
+probe the mapped tables and search the blob, several times slower than the in-memory
+index (3-5x at 2000 schemes).
+"""
+import hashlib
+import json
+import mmap
+import struct
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple, Union
+
+import numpy as np
+
+from .retrieval import COMPILED_SUFFIX, SchemeIndex, build_index
+from .rule_matrix import RuleMatrix
+from .similarity import SimilarityIndex
+
+MAGIC = b"SCHEMCAT"
+VERSION = 1
+_ALIGN = 64
+_PREFIX = struct.Struct("<8sII")
+
+# Record fields stored as strings; anything else goes to `extra`
+RECORD_FIELDS = ("id", "name", "description", "application_url")
+_STRING_FIELDS = RECORD_FIELDS + ("hay", "norm_name", "extra")
+RULE_COLUMNS = ("min_age", "max_age", "income_below", "land_size_max", "age_active",
+                "income_active", "land_active", "farmer", "requires_residency", "scalar")
+TABLES = ("grams", "token_postings", "key_postings", "key_prefixes")
+
+
+def compiled_path(json_path: Union[str, Path]) -> Path:
+    return Path(json_path).with_suffix(COMPILED_SUFFIX)
+
+
+def key_hash(key: str) -> int:
+    """Stable 64-bit hash of a posting key (Python's `hash` changes between processes)."""
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def read_header(path: Union[str, Path]) -> Dict[str, Any]:
+    with open(path, "rb") as f:
+        magic, version, size = _PREFIX.unpack(f.read(_PREFIX.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a compiled scheme catalog")
+        if version != VERSION:
+            raise ValueError(f"{path} has catalog format {version}, expected {VERSION}; recompile it")
+        return json.loads(f.read(size).decode("utf-8"))
+
+
+class PostingTable:
+    """Read-only `dict.get` over one serialized posting dict."""
+
+    def __init__(self, hashes: np.ndarray, indptr: np.ndarray, values: np.ndarray):
+        self.hashes = hashes
+        self.indptr = indptr
+        self.values = values
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        h = np.uint64(key_hash(key))
+        j = int(np.searchsorted(self.hashes, h))
+        if j < len(self.hashes) and self.hashes[j] == h:
+            return set(self.values[self.indptr[j]:self.indptr[j + 1]].tolist())
+        return default
+
+
+class StringColumn(Sequence):
+    """One string field of every record, decoded on access."""
+
+    def __init__(self, mm: mmap.mmap, base: int, offsets: np.ndarray):
+        self._mm = mm
+        self._base = base
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        a, b = self._offsets[i], self._offsets[i + 1]
+        return self._mm[self._base + a:self._base + b].decode("utf-8")
+
+    def containing(self, positions: Iterable[int], sub: str) -> Set[int]:
+        """The positions whose string contains `sub`, searched in the mapped bytes without
+        decoding (a UTF-8 substring match is a character substring match)."""
+        idx = np.fromiter(positions, dtype=np.int64)
+        needle = sub.encode("utf-8")
+        base, find = self._base, self._mm.find
+        starts = (self._offsets[idx] + base).tolist()
+        ends = (self._offsets[idx + 1] + base).tolist()
+        return {i for i, a, b in zip(idx.tolist(), starts, ends) if find(needle, a, b) >= 0}
+
+
+class LazySchemes(Sequence):
+    """The catalog's records as dicts, built from the string section on access."""
+
+    def __init__(self, catalog: "CompiledCatalog"):
+        self._present = catalog.array("str.present")
+        self._fields = [(bit, name, catalog.strings(name)) for bit, name in enumerate(RECORD_FIELDS)]
+        self._extra = catalog.strings("extra")
+
+    def __len__(self) -> int:
+        return len(self._present)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        present = int(self._present[i])
+        rec = {name: col[i] for bit, name, col in self._fields if present >> bit & 1}
+        extra = self._extra[i]
+        if extra:
+            rec.update(json.loads(extra))
+        return rec
+
+    def __iter__(self) -> Iterator[Dict]:
+        for i in range(len(self)):
+            yield self[i]
+
+
+class CompiledCatalog:
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.header = read_header(self.path)
+        with open(self.path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._base = self.header["base"]
+        self._blob = self._base + self.header["sections"]["str.blob"][0]
+
+    @property
+    def count(self) -> int:
+        return self.header["count"]
+
+    @property
+    def digest(self) -> str:
+        return self.header["digest"]
+
+    @property
+    def source_stamp(self) -> Optional[Tuple[int, int]]:
+        src = self.header.get("source")
+        return (src["mtime_ns"], src["size"]) if src else None
+
+    def array(self, name: str) -> np.ndarray:
+        offset, dtype, shape = self.header["sections"][name]
+        count = int(np.prod(shape))
+        return np.frombuffer(self._mm, dtype=np.dtype(dtype), count=count, offset=self._base + offset).reshape(shape)
+
+    def strings(self, field: str) -> StringColumn:
+        return StringColumn(self._mm, self._blob, self.array(f"str.offsets.{field}"))
+
+    @property
+    def schemes(self) -> LazySchemes:
+        return LazySchemes(self)
+
+    def table(self, name: str) -> PostingTable:
+        return PostingTable(*(self.array(f"table.{name}.{part}") for part in ("hashes", "indptr", "values")))
+
+    def index(self, schemes: Optional[Sequence[Dict]] = None) -> SchemeIndex:
+        return SchemeIndex.from_parts(
+            schemes if schemes is not None else self.schemes,
+            hays=self.strings("hay"), names=self.strings("norm_name"),
+            tables={name: self.table(name) for name in TABLES},
+            n=self.header["ngram"], phonetic=self.header["phonetic"],
+        )
+
+    def rules(self, schemes: Optional[Sequence[Dict]] = None) -> RuleMatrix:
+        columns = {name: self.array(f"rules.{name}") for name in RULE_COLUMNS}
+        return RuleMatrix.from_columns(schemes if schemes is not None else self.schemes, columns)
+
+    def similarity(self) -> Optional[SimilarityIndex]:
+        """The prebuilt similarity index, or None when compiled without one."""
+        meta = self.header.get("similarity")
+        if not meta:
+            return None
+        return SimilarityIndex(self.array("sim.indptr"), self.array("sim.rows"), self.array("sim.weights"),
+                               n_docs=meta["n_docs"], bits=meta["bits"])
+
+
+def _table_arrays(postings: Dict[str, Set[int]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Lookups return a hash's postings without checking the key, so two stored keys must
+    # never share a hash. A query key that is not in the catalog can still hash onto a stored
+    # one (odds about len(postings) / 2**64 per probe) and then gets that key's postings.
+    merged: Dict[int, Set[int]] = {}
+    for key, positions in postings.items():
+        h = key_hash(key)
+        if h in merged:
+            raise ValueError(f"Posting key hash collision on {key!r}; cannot compile this catalog")
+        merged[h] = positions
+    hashes = np.array(sorted(merged), dtype=np.uint64)
+    lists = [np.fromiter(sorted(merged[int(h)]), dtype=np.int32, count=len(merged[int(h)])) for h in hashes]
+    indptr = np.zeros(len(lists) + 1, dtype=np.int64)
+    np.cumsum([len(v) for v in lists], out=indptr[1:])
+    values = np.concatenate(lists) if lists else np.zeros(0, dtype=np.int32)
+    return hashes, indptr, values
+
+
+def write(schemes: Sequence[Dict], out: Union[str, Path], digest: str,
+          source_stamp: Optional[Tuple[int, int]] = None, similarity: bool = True) -> Dict[str, Any]:
+    """Compile `schemes` into `out`. Returns the header."""
+
+    index = build_index(schemes)
+    sections: Dict[str, np.ndarray] = {}
+
+    # string section
+    chunks: Dict[str, List[bytes]] = {f: [] for f in _STRING_FIELDS}
+    present = np.zeros(len(schemes), dtype=np.uint8)
+    for i, s in enumerate(schemes):
+        extra = {}
+        for bit, field in enumerate(RECORD_FIELDS):
+            v = s.get(field)
+            if isinstance(v, str):
+                present[i] |= 1 << bit
+                chunks[field].append(v.encode("utf-8"))
+            else:
+                chunks[field].append(b"")
+        for k, v in s.items():
+            if k not in RECORD_FIELDS or not isinstance(v, str):
+                extra[k] = v
+        chunks["hay"].append(index.hays[i].encode("utf-8"))
+        chunks["norm_name"].append(index.names[i].encode("utf-8"))
+        chunks["extra"].append(json.dumps(extra, ensure_ascii=False).encode("utf-8") if extra else b"")
+    blob = bytearray()
+    for field in _STRING_FIELDS:
+        offsets = np.zeros(len(schemes) + 1, dtype=np.int64)
+        for i, b in enumerate(chunks[field]):
+            offsets[i] = len(blob)
+            blob += b
+        offsets[-1] = len(blob)
+        sections[f"str.offsets.{field}"] = offsets
+    sections["str.present"] = present
+    sections["str.blob"] = np.frombuffer(bytes(blob), dtype=np.uint8)
+
+    rules = RuleMatrix(schemes)
+    for name in RULE_COLUMNS:
+        sections[f"rules.{name}"] = getattr(rules, name)
+
+    for name in TABLES:
+        for part, arr in zip(("hashes", "indptr", "values"), _table_arrays(getattr(index, name))):
+            sections[f"table.{name}.{part}"] = arr
+
+    sim_meta = None
+    if similarity:
+        sim = SimilarityIndex.build(schemes)
+        for name in ("indptr", "rows", "weights"):
+            sections[f"sim.{name}"] = getattr(sim, name)
+        sim_meta = {"n_docs": sim.n_docs, "bits": sim.bits}
+
+    layout, pos = {}, 0
+    for name, arr in sections.items():
+        pos = -(-pos // _ALIGN) * _ALIGN
+        layout[name] = [pos, arr.dtype.str, list(arr.shape)]
+        pos += arr.nbytes
+    header = {
+        "count": len(schemes), "digest": digest, "ngram": index.n, "phonetic": index.phonetic,
+        "similarity": sim_meta, "sections": layout,
+        "source": {"mtime_ns": source_stamp[0], "size": source_stamp[1]} if source_stamp else None,
+    }
+    # the header records where the sections start, which depends on its own length
+    base = 0
+    while True:
+        header["base"] = base
+        raw = json.dumps(header).encode("utf-8")
+        need = -(-(_PREFIX.size + len(raw)) // _ALIGN) * _ALIGN
+        if need == base:
+            break
+        base = need
+
+    out = Path(out)
+    tmp = out.with_name(out.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(_PREFIX.pack(MAGIC, VERSION, len(raw)))
+        f.write(raw)
+        for name, arr in sections.items():
+            f.write(b"\0" * (base + layout[name][0] - f.tell()))
+            f.write(np.ascontiguousarray(arr).tobytes())
+    # readers never see a half-written file
+    tmp.replace(out)
+    return header
@@ -1,9 +1,18 @@
+import json
+import os
 import time
 import uuid
 
-def apply_to_scheme(user_info: dict, scheme: dict) -> dict:
-    """Simulate applying to a government scheme. Returns fake application id and status."""
-    time.sleep(0.5)
+from .. import tracing
+
+# Simulated round-trip time of the application API
+LATENCY = 0.5
+# When set, applications are POSTed to `{API_URL}/apply` instead of being simulated
+API_URL = os.getenv("API_URL")
+API_TIMEOUT = float(os.getenv("API_TIMEOUT", "10"))
+
+
+def _submission(scheme: dict) -> dict:
     app_id = str(uuid.uuid4())
     return {
         "application_id": app_id,
@@ -11,3 +20,32 @@ def apply_to_scheme(user_info: dict, scheme: dict) -> dict:
         "scheme_id": scheme.get("id"),
         "message": "దరఖాస్తు విజయవంతంగా సమర్పించబడింది"
     }
+
+
+def _post(user_info: dict, scheme: dict) -> dict:
+    import urllib.request
+    body = json.dumps({"user_info": user_info, "scheme_id": scheme.get("id")}, ensure_ascii=False).encode("utf-8")
+    req = urllib.request.Request(API_URL.rstrip("/") + "/apply", data=body,
+                                 headers={"Content-Type": "application/json"})
+    # HTTP errors raise urllib.error.HTTPError
+    with urllib.request.urlopen(req, timeout=API_TIMEOUT) as resp:
+        return json.loads(resp.read().decode("utf-8"))
+
+
+def apply_to_scheme(user_info: dict, scheme: dict) -> dict:
+    """Simulate applying to a government scheme. Returns fake application id and status."""
+    with tracing.span("api_apply"):
+        if API_URL:
+            return _post(user_info, scheme)
+        time.sleep(LATENCY)
+        return _submission(scheme)
+
+
+async def apply_to_scheme_async(user_info: dict, scheme: dict) -> dict:
+    """Non-blocking variant of `apply_to_scheme` for the asyncio pipeline."""
+    import asyncio  # already loaded by the running event loop
+    with tracing.span("api_apply"):
+        if API_URL:
+            return await asyncio.to_thread(_post, user_info, scheme)
+        await asyncio.sleep(LATENCY)
+        return _submission(scheme)
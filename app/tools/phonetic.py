@@ -0,0 +1,92 @@
+"""Phonetic keys for Indic words, tolerant of common STT spelling errors.
+
+Brahmi-derived scripts (Devanagari, Telugu, ...) share one Unicode layout: each letter sits
+at the same offset inside its script's 128-code-point block. A key is built from those
+offsets, so it does not depend on the script:
+
+- nukta and virama are dropped, candrabindu/anusvara and a nasal consonant with virama
+  all become "n";
+- vowel length is ignored (i/ii, u/uu, e/ai, o/au), and the vowel "a" (inherent or long)
+  is dropped except at the start of a word;
+- aspirated/unaspirated, retroflex/dental and sibilant variants share a class
+  (k/kh, t/th/tt/tth, s/sh/ss, n/nn, l/ll, ...);
+- repeated classes collapse (gemination, doubled signs), and a final "mu" becomes "n".
+
+For example, "शेतकरी" and the misspelling "शेतकरि" have the same key, and so do
+Devanagari and Telugu spellings of the same word.
+"""
+import unicodedata
+from typing import Dict, List
+
+# First and last 128-code-point blocks handled: Devanagari (U+0900) ... Malayalam (U+0D00)
+_FIRST_BLOCK = 0x0900
+_LAST_BLOCK = 0x0D00
+
+_VIRAMA = 0x4D
+_NASALS = {0x19, 0x1E, 0x23, 0x28, 0x29, 0x2E}
+
+# offset inside the script block -> phonetic class ("" = dropped)
+_CLASSES: Dict[int, str] = {}
+for _cls, _offsets in {
+    "": (0x03, 0x3C, 0x3D, 0x4D, 0x55, 0x56, 0x70, 0x71),
+    "n": (0x01, 0x02, 0x19, 0x1E, 0x23, 0x28, 0x29),
+    "a": (0x05, 0x06, 0x3E),
+    "i": (0x07, 0x08, 0x3F, 0x40, 0x62, 0x63),
+    "u": (0x09, 0x0A, 0x41, 0x42),
+    # vocalic r is pronounced "ru" in Marathi and Telugu (मातृ / मात्रु)
+    "ru": (0x0B, 0x0C, 0x43, 0x44, 0x60, 0x61),
+    "r": (0x30, 0x31, 0x5A),
+    "e": (0x0D, 0x0E, 0x0F, 0x10, 0x45, 0x46, 0x47, 0x48),
+    "o": (0x11, 0x12, 0x13, 0x14, 0x49, 0x4A, 0x4B, 0x4C),
+    "k": (0x15, 0x16),
+    "g": (0x17, 0x18),
+    "c": (0x1A, 0x1B, 0x58),
+    "j": (0x1C, 0x1D, 0x59),
+    "t": (0x1F, 0x20, 0x24, 0x25),
+    "d": (0x21, 0x22, 0x26, 0x27),
+    "p": (0x2A, 0x2B),
+    "b": (0x2C, 0x2D),
+    "m": (0x2E,),
+    "y": (0x2F,),
+    "l": (0x32, 0x33, 0x34),
+    "v": (0x35,),
+    "s": (0x36, 0x37, 0x38),
+    "h": (0x39,),
+}.items():
+    for _o in _offsets:
+        _CLASSES[_o] = _cls
+# digits
+for _o in range(0x66, 0x70):
+    _CLASSES[_o] = str(_o - 0x66)
+
+_VOWEL_START = {0x05, 0x06}
+
+
+def phonetic_key(word: str) -> str:
+    """Phonetic key of one (already normalized) word; characters outside the Indic
+    blocks are kept lowercased."""
+    out: List[str] = []
+    chars = unicodedata.normalize("NFD", word)
+    n = len(chars)
+    for idx, ch in enumerate(chars):
+        cp = ord(ch)
+        block = cp & ~0x7F
+        if not _FIRST_BLOCK <= block <= _LAST_BLOCK:
+            cls = ch.lower() if not unicodedata.combining(ch) else ""
+        else:
+            off = cp - block
+            if off in _NASALS and idx + 1 < n and ord(chars[idx + 1]) - block == _VIRAMA:
+                # half nasal before a consonant, same as anusvara
+                cls = "n"
+            else:
+                cls = _CLASSES.get(off, "")
+            if cls == "a" and (out or off not in _VOWEL_START):
+                cls = ""
+        if cls and (not out or out[-1] != cls):
+            out.append(cls)
+    key = "".join(out)
+    # Telugu writes a final "mu" as anusvara (పథకము / పథకం)
+    if key.endswith("mu") and len(key) > 2:
+        key = key[:-2] + "n"
+    return key
+
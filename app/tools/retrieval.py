@@ -1,64 +1,442 @@
+import heapq
 import json
-from typing import List, Dict, Union
+import re
+import hashlib
+import threading
+import time
+from typing import List, Dict, Union, Set, Optional, Callable, Any, Tuple, Iterator, Sequence
 import os
 from pathlib import Path
 
+from .. import tracing
+from .phonetic import phonetic_key
+
 # Resolve schemes file relative to the repository root (two levels up from this file)
 DEFAULT_SCHEMES = {
     "mr": Path(__file__).resolve().parents[2] / "schemes_mr.json",
     "te": Path(__file__).resolve().parents[2] / "schemes_te.json",
 }
 
-SCHEMES_PATH = DEFAULT_SCHEMES.get(os.getenv("APP_LANG", "mr"), DEFAULT_SCHEMES["mr"])
+# Explicit catalog file; when unset, the catalog for APP_LANG (read on first use)
+SCHEMES_PATH: Optional[Path] = None
+
+# remove ASCII punctuation and common unicode punctuation
+_PUNCT_RE = re.compile(r"[\u0021-\u002f\u003a-\u0040\u005b-\u0060\u007b-\u007e\u0964\u0965,。]")
+_SPACE_RE = re.compile(r"\s+")
+
+# Length of the character n-grams used by the inverted index
+NGRAM = 3
+
+# Relevance weight of a keyword hit in the scheme name vs only in the description
+NAME_WEIGHT = 2
+DESC_WEIGHT = 1
+
+# Opt-in: also match keywords by Indic phonetic key, so STT spelling variants (vowel
+# length, nukta, anusvara, aspirated/retroflex consonants) still find their scheme
+PHONETIC = os.getenv("RETRIEVAL_PHONETIC", "0") == "1"
+# Shortest key used for prefix matches (inflected forms); shorter keys must match whole
+PHONETIC_MIN_KEY = 4
+
+# Compiled catalogs (scripts/compile_catalog.py) next to the JSON, used when up to date
+COMPILED_SUFFIX = ".catalog"
+
+# Seconds between file stat checks of a cached catalog; no I/O happens in between
+RELOAD_INTERVAL = float(os.getenv("SCHEMES_RELOAD_INTERVAL", "2.0"))
+
 
-def load_schemes(path: Union[str, Path] = SCHEMES_PATH) -> List[Dict]:
-    p = Path(path)
+def schemes_path(lang: Optional[str] = None) -> Path:
+    """Catalog file for `lang`, or the configured default catalog."""
+    if lang in DEFAULT_SCHEMES:
+        return DEFAULT_SCHEMES[lang]
+    if SCHEMES_PATH is not None:
+        return Path(SCHEMES_PATH)
+    return DEFAULT_SCHEMES.get(os.getenv("APP_LANG", "mr"), DEFAULT_SCHEMES["mr"])
+
+
+def load_schemes(path: Union[str, Path, None] = None) -> Sequence[Dict]:
+    """Records of a JSON catalog, or the lazily built records of a compiled `.catalog`."""
+    p = Path(path) if path is not None else schemes_path()
     if not p.exists():
         raise FileNotFoundError(f"Schemes file not found at {p}")
+    if p.suffix == COMPILED_SUFFIX:
+        from .catalog_file import CompiledCatalog
+        return CompiledCatalog(p).schemes
     with open(p, "r", encoding="utf-8") as f:
         return json.load(f)
 
-def find_schemes_by_keywords(keywords: List[str], schemes=None):
-    if schemes is None:
-        schemes = load_schemes()
-    import re
-
-    def normalize(text: str) -> str:
-        # Lowercase and remove common punctuation characters
-        t = text.lower()
-        # remove ASCII punctuation and common unicode punctuation
-        t = re.sub(r"[\u0021-\u002f\u003a-\u0040\u005b-\u0060\u007b-\u007e\u0964\u0965,。]", " ", t)
-        # collapse whitespace
-        t = re.sub(r"\s+", " ", t).strip()
-        return t
-
-    def tokens(text: str) -> List[str]:
-        return [tok for tok in normalize(text).split(" ") if tok]
-
-    matched = []
-    # precompute normalized haystacks
-    scheme_hay = []
-    for s in schemes:
-        hay = f"{s.get('name', '')} {s.get('description', '')}"
-        scheme_hay.append((s, normalize(hay), tokens(hay)))
-
-    for k in keywords:
-        nk = normalize(k)
-        for s, hay_norm, hay_tokens in scheme_hay:
-            # direct substring
-            if nk and nk in hay_norm:
-                if s not in matched:
-                    matched.append(s)
-                continue
-            # token-based fuzzy: any token overlap (substring)
-            for tok in tokens(nk):
-                for h in hay_tokens:
-                    if tok in h or h in tok:
-                        if s not in matched:
-                            matched.append(s)
-                        break
-                else:
+
+def normalize(text: str) -> str:
+    # Lowercase and remove common punctuation characters
+    t = text.lower()
+    t = _PUNCT_RE.sub(" ", t)
+    # collapse whitespace
+    t = _SPACE_RE.sub(" ", t).strip()
+    return t
+
+
+def tokens(text: str) -> List[str]:
+    return [tok for tok in normalize(text).split(" ") if tok]
+
+
+def _containing(column: Sequence[str], positions: Set[int], q: str) -> Set[int]:
+    """The positions whose entry of `column` contains `q`."""
+    if isinstance(column, list):
+        return {i for i in positions if q in column[i]}
+    # a mapped column (catalog_file.StringColumn) searches without decoding
+    return column.containing(positions, q)
+
+
+class SchemeIndex:
+    """Character n-gram inverted index over scheme name + description.
+
+    Built once per catalog. Every gram of length 1..NGRAM of each normalized haystack
+    maps to the set of scheme positions containing it, and every haystack token maps to
+    the schemes it appears in. Lookups only touch the postings of the query grams and
+    verify the (few) candidates, instead of scanning the whole catalog.
+
+    With `phonetic`, the phonetic key of every haystack token (see `phonetic.py`) and each
+    of its prefixes of at least PHONETIC_MIN_KEY classes are indexed too, so approximate
+    matches are dictionary probes rather than edit distances against every token.
+    """
+
+    def __init__(self, schemes: List[Dict], n: int = NGRAM, phonetic: Optional[bool] = None):
+        self.schemes = schemes
+        self.n = n
+        self.phonetic = PHONETIC if phonetic is None else phonetic
+        self.hays: List[str] = []
+        self.names: List[str] = []
+        self.grams: Dict[str, Set[int]] = {}
+        self.token_postings: Dict[str, Set[int]] = {}
+        self.key_postings: Dict[str, Set[int]] = {}
+        self.key_prefixes: Dict[str, Set[int]] = {}
+        for i, s in enumerate(schemes):
+            hay = normalize(f"{s.get('name', '')} {s.get('description', '')}")
+            self.hays.append(hay)
+            self.names.append(normalize(s.get('name', '')))
+            for size in range(1, n + 1):
+                for j in range(len(hay) - size + 1):
+                    self.grams.setdefault(hay[j:j + size], set()).add(i)
+            for tok in hay.split(" "):
+                if tok:
+                    self.token_postings.setdefault(tok, set()).add(i)
+        if self.phonetic:
+            for tok, positions in self.token_postings.items():
+                key = phonetic_key(tok)
+                if not key:
                     continue
-                break
+                self.key_postings.setdefault(key, set()).update(positions)
+                for size in range(PHONETIC_MIN_KEY, len(key) + 1):
+                    self.key_prefixes.setdefault(key[:size], set()).update(positions)
+
+    @classmethod
+    def from_parts(cls, schemes: Sequence[Dict], hays: Sequence[str], names: Sequence[str],
+                   tables: Dict[str, Any], n: int = NGRAM, phonetic: bool = False) -> "SchemeIndex":
+        """An index over prebuilt parts, e.g. the serialized tables of a compiled catalog.
+
+        `tables` holds `grams`, `token_postings`, `key_postings` and `key_prefixes`; each
+        only needs `get(key, default)` returning a set of positions.
+        """
+        self = cls.__new__(cls)
+        self.schemes = schemes
+        self.n = n
+        self.phonetic = phonetic
+        self.hays = hays
+        self.names = names
+        for name, table in tables.items():
+            setattr(self, name, table)
+        return self
+
+    def _substring(self, q: str) -> Set[int]:
+        """Positions of schemes whose haystack contains `q`."""
+        if len(q) <= self.n:
+            return set(self.grams.get(q, ()))
+        cand: Optional[Set[int]] = None
+        # intersect the rarest postings first
+        postings = sorted((self.grams.get(q[j:j + self.n], set()) for j in range(len(q) - self.n + 1)), key=len)
+        for p in postings:
+            cand = set(p) if cand is None else cand & p
+            if not cand:
+                return set()
+        return _containing(self.hays, cand, q)
+
+    def _contained_tokens(self, tok: str) -> Set[int]:
+        """Positions of schemes having a haystack token that is a substring of `tok`."""
+        out: Set[int] = set()
+        for a in range(len(tok)):
+            for b in range(a + 1, len(tok) + 1):
+                p = self.token_postings.get(tok[a:b])
+                if p:
+                    out |= p
+        return out
+
+    def _exact(self, nk: str) -> Set[int]:
+        """Positions matching normalized keyword `nk` by substring or token overlap."""
+        hits = self._substring(nk)
+        for tok in nk.split(" "):
+            # a query token inside a haystack token is a substring of the haystack
+            hits |= self._substring(tok)
+            hits |= self._contained_tokens(tok)
+        return hits
+
+    def _phonetic(self, nk: str) -> Set[int]:
+        """Positions having a token that sounds like a token of `nk` (same key, or one
+        key a prefix of the other for inflected forms)."""
+        hits: Set[int] = set()
+        for tok in nk.split(" "):
+            key = phonetic_key(tok)
+            if len(key) < PHONETIC_MIN_KEY:
+                hits |= self.key_postings.get(key, set()) if key else set()
+                continue
+            # haystack tokens extending the query key...
+            hits |= self.key_prefixes.get(key, set())
+            # ...and haystack tokens whose key is a prefix of it
+            for size in range(PHONETIC_MIN_KEY, len(key)):
+                hits |= self.key_postings.get(key[:size], set())
+        return hits
+
+    def lookup(self, keyword: str) -> Set[int]:
+        """Scheme positions matching one keyword (direct substring or token overlap, or
+        phonetic key when enabled)."""
+        nk = normalize(keyword)
+        if not nk:
+            return set()
+        hits = self._exact(nk)
+        if self.phonetic:
+            hits |= self._phonetic(nk)
+        return hits
+
+    def search_ids(self, keywords: List[str]) -> List[int]:
+        """Positions of matching schemes, in the order `search` returns them."""
+        matched: List[int] = []
+        seen: Set[int] = set()
+        for k in keywords:
+            # keep catalog order within a keyword, keyword order across keywords
+            for i in sorted(self.lookup(k) - seen):
+                seen.add(i)
+                matched.append(i)
+        return matched
+
+    def search(self, keywords: List[str]) -> List[Dict]:
+        return [self.schemes[i] for i in self.search_ids(keywords)]
+
+    def scores(self, keywords: List[str]) -> Dict[int, int]:
+        """Relevance of each matching scheme: weighted count of keywords that hit it."""
+        scores: Dict[int, int] = {}
+        for k in keywords:
+            nk = normalize(k)
+            if not nk:
+                continue
+            exact = self._exact(nk)
+            in_name: Set[int] = set()
+            for t in nk.split(" "):
+                in_name |= _containing(self.names, exact - in_name, t)
+            for i in exact:
+                scores[i] = scores.get(i, 0) + (NAME_WEIGHT if i in in_name else DESC_WEIGHT)
+            if self.phonetic:
+                # an approximate hit never outranks an exact one on the same keyword
+                for i in self._phonetic(nk) - exact:
+                    scores[i] = scores.get(i, 0) + DESC_WEIGHT
+        return scores
+
+    def iter_ranked(self, keywords: List[str]) -> Iterator[Tuple[int, int]]:
+        """Yield (position, score) of matching schemes, best first (ties in catalog order).
+
+        Ordering is done with a heap, so a consumer that stops early pays only for the
+        items it takes.
+        """
+        heap = [(-score, i) for i, score in self.scores(keywords).items()]
+        tracing.incr("retrieval_hits", len(heap))
+        heapq.heapify(heap)
+        while heap:
+            neg, i = heapq.heappop(heap)
+            yield i, -neg
+
+
+def build_index(schemes: List[Dict]) -> SchemeIndex:
+    return SchemeIndex(schemes)
+
+
+class CatalogSnapshot:
+    """Immutable view of one version of a catalog file plus its derived structures."""
+
+    def __init__(self, schemes: Sequence[Dict], stamp: Tuple[int, int], digest: str,
+                 index: Optional[SchemeIndex] = None, derived: Optional[Dict[str, Any]] = None,
+                 source: Optional[Path] = None):
+        self.schemes = schemes
+        self.stamp = stamp
+        self.digest = digest
+        # the catalog file, if any; derived indexes saved to disk go next to it
+        self.source = source
+        self.index = index if index is not None else build_index(schemes)
+        self._derived: Dict[str, Any] = dict(derived or {})
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_compiled(cls, catalog, stamp: Tuple[int, int]) -> "CatalogSnapshot":
+        """Snapshot backed by a memory-mapped `catalog_file.CompiledCatalog`; the search
+        index, eligibility rules and similarity index come from the file, not rebuilt.
+
+        A search index compiled with a different phonetic setting than `PHONETIC` is rebuilt
+        in memory from the compiled records, so results match the JSON catalog's."""
+        schemes = catalog.schemes
+        derived = {"rules": catalog.rules(schemes)}
+        sim = catalog.similarity()
+        if sim is not None:
+            derived["similarity"] = sim
+        if catalog.header.get("phonetic") == PHONETIC:
+            index = catalog.index(schemes)
+        else:
+            print(f"[Retrieval] {catalog.path} was compiled with RETRIEVAL_PHONETIC="
+                  f"{int(bool(catalog.header.get('phonetic')))}; rebuilding its search index (recompile it)")
+            index = build_index(schemes)
+        return cls(schemes, stamp, catalog.digest, index=index, derived=derived, source=catalog.path)
+
+    def derived(self, name: str, builder: Callable[[List[Dict]], Any]) -> Any:
+        """Return a structure built from this snapshot's schemes, building it once on first use."""
+        try:
+            return self._derived[name]
+        except KeyError:
+            pass
+        with self._lock:
+            if name not in self._derived:
+                self._derived[name] = builder(self.schemes)
+            return self._derived[name]
+
+
+class SchemeCatalog:
+    """Process-wide cache of one schemes file with mtime/size/hash based hot reload.
+
+    When a compiled `.catalog` next to the JSON was compiled from its current version
+    (same size and mtime), it is memory-mapped instead of parsing the JSON. `path` may
+    also name a compiled catalog directly.
+
+    Readers call `snapshot()` and get the current immutable version without taking a
+    lock. At most every `interval` seconds one reader stats the file; if mtime or size
+    changed and the content hash differs, a new snapshot (with its index) is built and
+    swapped in with a single reference assignment. Other readers keep using the old
+    snapshot meanwhile, so a reload never blocks them.
+    """
+
+    def __init__(self, path: Union[str, Path], interval: float = RELOAD_INTERVAL):
+        self.path = Path(path)
+        self.interval = interval
+        self._reload_lock = threading.Lock()
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._next_check = 0.0
+        self.reload()
+
+    def _stat(self) -> Tuple[int, int]:
+        st = self.path.stat()
+        return (st.st_mtime_ns, st.st_size)
+
+    def reload(self, force: bool = False) -> bool:
+        """Re-read the file if it changed. Returns True when a new snapshot was installed."""
+        with self._reload_lock:
+            return self._reload_locked(force)
+
+    def _reload_locked(self, force: bool = False) -> bool:
+        self._next_check = time.monotonic() + self.interval
+        if not self.path.exists():
+            if self._snapshot is None:
+                raise FileNotFoundError(f"Schemes file not found at {self.path}")
+            # keep serving the last good version
+            return False
+        stamp = self._stat()
+        cur = self._snapshot
+        if cur is not None and not force and cur.stamp == stamp:
+            return False
+        compiled = self._load_compiled(stamp)
+        if compiled is not None:
+            if cur is not None and not force and cur.digest == compiled.digest:
+                cur.stamp = stamp
+                return False
+            self._snapshot = compiled
+            print(f"[Retrieval] Mapped {len(compiled.schemes)} compiled schemes from {self.path}")
+            return True
+        if self.path.suffix == COMPILED_SUFFIX:
+            if cur is None:
+                raise ValueError(f"Cannot read compiled catalog {self.path}")
+            # keep serving the last good version
+            return False
+        raw = self.path.read_bytes()
+        digest = hashlib.sha1(raw).hexdigest()
+        if cur is not None and not force and cur.digest == digest:
+            # touched but unchanged: keep the snapshot and its derived indexes
+            cur.stamp = stamp
+            return False
+        try:
+            schemes = json.loads(raw.decode("utf-8"))
+        except ValueError as e:
+            if cur is None:
+                raise
+            print(f"[Retrieval] Ignoring invalid schemes file {self.path}: {e}")
+            return False
+        self._snapshot = CatalogSnapshot(schemes, stamp, digest, source=self.path)
+        if cur is not None:
+            print(f"[Retrieval] Reloaded {len(schemes)} schemes from {self.path}")
+        return True
+
+    def _load_compiled(self, stamp: Tuple[int, int]) -> Optional[CatalogSnapshot]:
+        if self.path.suffix == COMPILED_SUFFIX:
+            path, expected = self.path, None
+        else:
+            path, expected = self.path.with_suffix(COMPILED_SUFFIX), stamp
+            if not path.exists():
+                return None
+        from .catalog_file import CompiledCatalog
+        try:
+            catalog = CompiledCatalog(path)
+        except (OSError, ValueError) as e:
+            print(f"[Retrieval] Ignoring compiled catalog {path}: {e}")
+            return None
+        if expected is not None and catalog.source_stamp != expected:
+            print(f"[Retrieval] {path} is older than {self.path}; loading the JSON (recompile it)")
+            return None
+        return CatalogSnapshot.from_compiled(catalog, stamp)
+
+    def snapshot(self) -> CatalogSnapshot:
+        # only one reader checks the file; the rest continue with the current snapshot
+        if time.monotonic() >= self._next_check and self._reload_lock.acquire(blocking=False):
+            try:
+                self._reload_locked()
+            except OSError as e:
+                print(f"[Retrieval] Catalog reload failed: {e}")
+            finally:
+                self._reload_lock.release()
+        return self._snapshot
+
+    @property
+    def schemes(self) -> List[Dict]:
+        return self.snapshot().schemes
+
+    @property
+    def index(self) -> SchemeIndex:
+        return self.snapshot().index
+
+
+_CATALOGS: Dict[Path, SchemeCatalog] = {}
+_CATALOGS_LOCK = threading.Lock()
+
+
+def get_catalog(path: Union[str, Path, None] = None, lang: Optional[str] = None) -> SchemeCatalog:
+    """Return the shared catalog for a schemes file (or language), loading it on first use."""
+    if path is None:
+        path = schemes_path(lang)
+    key = Path(path).resolve()
+    cat = _CATALOGS.get(key)
+    if cat is None:
+        with _CATALOGS_LOCK:
+            cat = _CATALOGS.get(key)
+            if cat is None:
+                cat = SchemeCatalog(key)
+                _CATALOGS[key] = cat
+    return cat
+
 
-    return matched
+def find_schemes_by_keywords(keywords: List[str], schemes=None, index: Optional[SchemeIndex] = None):
+    if index is None:
+        if schemes is None:
+            index = get_catalog().index
+        else:
+            index = build_index(schemes)
+    return index.search(keywords)
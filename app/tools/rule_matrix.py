@@ -0,0 +1,249 @@
+"""Eligibility rules compiled into NumPy column arrays.
+
+`check_eligibility` walks one scheme's rule dict at a time. `RuleMatrix` compiles a whole
+catalog once into columns (NaN where a bound is not set) so one user profile is checked
+against every scheme in a single vectorized pass. Results are identical to
+`eligibility.check_eligibility`, including its truthiness rules (a `min_age` of 0 is "no
+bound", a `land_size_max` of 0 is a bound). Schemes or profiles with values the arrays
+cannot represent exactly (non-numeric, or integers beyond float64 precision) are
+evaluated with the scalar function instead.
+"""
+from numbers import Real
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .eligibility import check_eligibility
+
+# Bits of the `missing` mask, in the order check_eligibility reports them
+MISSING_AGE = 1
+MISSING_INCOME = 2
+MISSING_LAND = 4
+MISSING_FIELDS = [(MISSING_AGE, "age"), (MISSING_INCOME, "annual_income"), (MISSING_LAND, "land_size")]
+
+_EXACT_LIMIT = 2 ** 53
+
+
+def _exact_number(v: Any) -> bool:
+    if not isinstance(v, Real):
+        return False
+    if isinstance(v, int) and abs(v) > _EXACT_LIMIT:
+        return False
+    return True
+
+
+def missing_names(mask: int) -> List[str]:
+    return [name for bit, name in MISSING_FIELDS if mask & bit]
+
+
+class RuleMatrix:
+    def __init__(self, schemes: Sequence[Dict]):
+        n = len(schemes)
+        self.schemes = schemes
+        self.min_age = np.full(n, np.nan)
+        self.max_age = np.full(n, np.nan)
+        self.income_below = np.full(n, np.nan)
+        self.land_size_max = np.full(n, np.nan)
+        self.age_active = np.zeros(n, dtype=bool)
+        self.income_active = np.zeros(n, dtype=bool)
+        self.land_active = np.zeros(n, dtype=bool)
+        self.farmer = np.zeros(n, dtype=bool)
+        # compiled for completeness; check_eligibility does not evaluate it
+        self.requires_residency = np.zeros(n, dtype=bool)
+        # schemes whose rules only the scalar path evaluates exactly
+        self.scalar = np.zeros(n, dtype=bool)
+
+        for i, s in enumerate(schemes):
+            rules = s.get("eligibility", {}) or {}
+            try:
+                self._compile_row(i, rules)
+            except (TypeError, ValueError):
+                self.scalar[i] = True
+        self.scalar_rows = np.flatnonzero(self.scalar)
+
+    @classmethod
+    def from_columns(cls, schemes: Sequence[Dict], columns: Dict[str, np.ndarray]) -> "RuleMatrix":
+        """A matrix over precompiled columns (see `catalog_file`), without reading the rules."""
+        self = cls.__new__(cls)
+        self.schemes = schemes
+        for name, column in columns.items():
+            setattr(self, name, column)
+        self.scalar_rows = np.flatnonzero(self.scalar)
+        return self
+
+    def _compile_row(self, i: int, rules: Dict[str, Any]) -> None:
+        lo, hi, inc, land = rules.get("min_age"), rules.get("max_age"), rules.get("income_below"), rules.get("land_size_max")
+        for v in (lo, hi, inc):
+            if v and not _exact_number(v):
+                raise TypeError(v)
+        if land is not None and not _exact_number(land):
+            raise TypeError(land)
+        if lo or hi:
+            self.age_active[i] = True
+            if lo:
+                self.min_age[i] = lo
+            if hi:
+                self.max_age[i] = hi
+        if inc:
+            self.income_active[i] = True
+            self.income_below[i] = inc
+        if land is not None:
+            self.land_active[i] = True
+            self.land_size_max[i] = land
+        self.farmer[i] = bool(rules.get("farmer"))
+        self.requires_residency[i] = bool(rules.get("requires_residency"))
+
+    def __len__(self) -> int:
+        return len(self.schemes)
+
+    def evaluate_masks(self, user_info: Dict[str, Any], rows: Optional[Sequence[int]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (eligible bool array, missing bitmask array) for all schemes or the given rows."""
+        idx = slice(None) if rows is None else np.asarray(rows, dtype=np.intp)
+        age, inc, land = user_info.get("age"), user_info.get("annual_income"), user_info.get("land_size")
+        if any(v is not None and not _exact_number(v) for v in (age, inc, land)):
+            return self._evaluate_scalar(user_info, rows)
+
+        age_active = self.age_active[idx]
+        inc_active = self.income_active[idx]
+        land_active = self.land_active[idx]
+        eligible = np.ones(age_active.shape[0], dtype=bool)
+        missing = np.zeros(age_active.shape[0], dtype=np.uint8)
+
+        with np.errstate(invalid="ignore"):
+            if age is None:
+                missing[age_active] |= MISSING_AGE
+                eligible &= ~age_active
+            else:
+                # NaN bounds compare False, i.e. "no bound"
+                eligible &= ~((age < self.min_age[idx]) | (age > self.max_age[idx]))
+            if inc is None:
+                missing[inc_active] |= MISSING_INCOME
+                eligible &= ~inc_active
+            else:
+                eligible &= ~(inc > self.income_below[idx])
+            if not user_info.get("farmer"):
+                eligible &= ~self.farmer[idx]
+            if land is None:
+                missing[land_active] |= MISSING_LAND
+                eligible &= ~land_active
+            else:
+                eligible &= ~(land > self.land_size_max[idx])
+
+        if self.scalar_rows.size:
+            sub = self.scalar[idx]
+            if sub.any():
+                positions = np.arange(len(self.schemes))[idx][sub]
+                e, m = self._evaluate_scalar(user_info, positions)
+                eligible[sub] = e
+                missing[sub] = m
+        return eligible, missing
+
+    def _evaluate_scalar(self, user_info: Dict[str, Any], rows: Optional[Sequence[int]]) -> Tuple[np.ndarray, np.ndarray]:
+        rows = range(len(self.schemes)) if rows is None else rows
+        eligible, missing = [], []
+        for i in rows:
+            res = check_eligibility(user_info, self.schemes[int(i)])
+            eligible.append(res["eligible"])
+            mask = 0
+            for bit, name in MISSING_FIELDS:
+                if name in res["missing"]:
+                    mask |= bit
+            missing.append(mask)
+        return np.array(eligible, dtype=bool), np.array(missing, dtype=np.uint8)
+
+    def evaluate(self, user_info: Dict[str, Any], rows: Optional[Sequence[int]] = None) -> List[Dict]:
+        """Same output as calling check_eligibility on each scheme (or each given row)."""
+        eligible, missing = self.evaluate_masks(user_info, rows)
+        return [{"eligible": bool(e), "missing": missing_names(int(m))} for e, m in zip(eligible, missing)]
+
+    def screen_users(self, users: Sequence[Dict[str, Any]], row: int,
+                     columns: Optional["UserColumns"] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Check many user profiles against one scheme.
+
+        Returns (blocked, missing, invalid): `blocked` is True where a known field fails a
+        rule, `missing` is the bitmask of fields the rule needs but the profile lacks. A user
+        is eligible exactly when neither is set, like `check_eligibility`. `invalid` marks
+        profiles whose values cannot be compared with the rule (e.g. a non-numeric age);
+        their other results are meaningless. Pass `columns` to reuse one `UserColumns`
+        across several schemes.
+        """
+        cols = columns if columns is not None else UserColumns(users)
+        n = len(users)
+        farmer = cols.farmer
+        exact = cols.exact
+
+        blocked = np.zeros(n, dtype=bool)
+        missing = np.zeros(n, dtype=np.uint8)
+        invalid = np.zeros(n, dtype=bool)
+        with np.errstate(invalid="ignore"):
+            if self.age_active[row]:
+                present, age = cols["age"]
+                missing[~present] |= MISSING_AGE
+                blocked |= present & ((age < self.min_age[row]) | (age > self.max_age[row]))
+            if self.income_active[row]:
+                present, inc = cols["annual_income"]
+                missing[~present] |= MISSING_INCOME
+                blocked |= present & (inc > self.income_below[row])
+            if self.farmer[row]:
+                blocked |= ~farmer
+            if self.land_active[row]:
+                present, land = cols["land_size"]
+                missing[~present] |= MISSING_LAND
+                blocked |= present & (land > self.land_size_max[row])
+
+        slow = np.flatnonzero(~exact) if not self.scalar[row] else np.arange(n)
+        for j in slow:
+            try:
+                blocked[j], missing[j] = self._screen_scalar(users[j], row)
+            except (TypeError, ValueError):
+                # one malformed stored profile must not abort a screening run
+                blocked[j], missing[j], invalid[j] = False, 0, True
+        return blocked, missing, invalid
+
+    def _screen_scalar(self, user_info: Dict[str, Any], row: int) -> Tuple[bool, int]:
+        scheme = self.schemes[row]
+        res = check_eligibility(user_info, scheme)
+        mask = 0
+        for bit, name in MISSING_FIELDS:
+            if name in res["missing"]:
+                mask |= bit
+        if res["eligible"] or not mask:
+            return not res["eligible"], mask
+        # drop the rules of missing fields to see whether the known ones pass
+        rules = dict(scheme.get("eligibility", {}) or {})
+        for key, bit in (("min_age", MISSING_AGE), ("max_age", MISSING_AGE),
+                         ("income_below", MISSING_INCOME), ("land_size_max", MISSING_LAND)):
+            if mask & bit:
+                rules.pop(key, None)
+        known = check_eligibility(user_info, {"eligibility": rules})
+        return not known["eligible"], mask
+
+
+class UserColumns:
+    """Numeric profile fields of a batch of users as arrays, with presence masks."""
+
+    def __init__(self, users: Sequence[Dict[str, Any]]):
+        n = len(users)
+        self.exact = np.ones(n, dtype=bool)
+        self.fields: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        for field in ("age", "annual_income", "land_size"):
+            present = np.zeros(n, dtype=bool)
+            values = np.zeros(n)
+            for j, u in enumerate(users):
+                v = u.get(field)
+                if v is None:
+                    continue
+                if _exact_number(v):
+                    present[j] = True
+                    values[j] = v
+                else:
+                    self.exact[j] = False
+            self.fields[field] = (present, values)
+        self.farmer = np.array([bool(u.get("farmer")) for u in users], dtype=bool)
+
+    def __getitem__(self, field: str) -> Tuple[np.ndarray, np.ndarray]:
+        return self.fields[field]
+
+
+def compile_rules(schemes: Sequence[Dict]) -> RuleMatrix:
+    return RuleMatrix(schemes)
@@ -0,0 +1,222 @@
+"""Character n-gram TF-IDF similarity between an utterance and the scheme catalog.
+
+Keyword retrieval only says whether a keyword occurs. `SimilarityIndex` ranks every scheme
+by the cosine similarity of its name + description to a whole utterance, which still works
+when the planner's keywords miss or the transcript is noisy.
+
+Character n-grams (NGRAMS) are hashed into buckets, so no vocabulary is stored. The number
+of buckets grows with the catalog's text, up to 2**BITS, and the index is three flat NumPy
+arrays in term-major (CSC) order:
+
+- `indptr[t]:indptr[t + 1]` is the slice of postings for bucket t,
+- `rows` holds the scheme positions of those postings,
+- `weights` holds their L2-normalized tf-idf weights.
+
+Document frequencies are the posting lengths, so idf needs no extra array. Scoring is one
+sparse matrix-vector product (the postings of the query's buckets summed with
+`np.bincount`) followed by `np.argpartition` top-k. N-grams found in more than MAX_DF of
+a large catalog are dropped at build time; they barely affect the ranking and would make
+every query touch most of the catalog (on 200k synthetic schemes, pruning at 10% takes a
+query from ~45 ms to ~1.5 ms).
+
+Indexes are saved under `.similarity_index/<catalog sha1>/` next to the catalog file (or
+under `SIMILARITY_INDEX_DIR`) and opened with `mmap_mode="r"`, so loading is instant and
+worker processes share the pages. `scripts/build_similarity_index.py`
+builds them ahead of time; otherwise the first use builds and saves one.
+"""
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .retrieval import normalize
+
+# Character n-gram sizes (over the normalized text padded with spaces)
+NGRAMS = (2, 3, 4)
+# log2 of the largest number of hash buckets; smaller catalogs get two to four buckets per
+# n-gram occurrence, but never fewer than 2**MIN_BITS
+BITS = int(os.getenv("SIMILARITY_BITS", "20"))
+MIN_BITS = 10
+# N-grams in more than this fraction of schemes are not indexed, unless their postings
+# are shorter than MIN_PRUNE_DF (small catalogs keep every n-gram)
+MAX_DF = 0.1
+MIN_PRUNE_DF = 1000
+# Minimum cosine similarity for a scheme to count as a match
+MIN_SCORE = float(os.getenv("SIMILARITY_MIN_SCORE", "0.2"))
+# Where prebuilt indexes live, one subdirectory per catalog content hash; by default a
+# .similarity_index directory next to the catalog file
+INDEX_DIR: Optional[Path] = Path(os.environ["SIMILARITY_INDEX_DIR"]) if os.getenv("SIMILARITY_INDEX_DIR") else None
+INDEX_DIR_NAME = ".similarity_index"
+# Schemes vectorized per NumPy pass while building
+BUILD_CHUNK = 20000
+
+FORMAT = 1
+_ARRAYS = ("indptr", "rows", "weights")
+
+_P = np.uint64(1000003)
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+
+def scheme_text(scheme: Dict) -> str:
+    return normalize(f"{scheme.get('name', '')} {scheme.get('description', '')}")
+
+
+def _buckets(texts: Sequence[str], bits: int) -> Tuple[np.ndarray, np.ndarray]:
+    """(text position, hash bucket) of every n-gram of `texts`, computed for all texts at once."""
+    joined = "\x00".join(f" {t} " for t in texts)
+    codes = np.frombuffer(joined.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    sep = codes == 0
+    # separators count towards the next text, and no n-gram may contain one
+    owner = np.cumsum(sep)
+    seps = np.concatenate(([0], owner))
+    docs, buckets = [], []
+    for n in NGRAMS:
+        size = len(codes) - n + 1
+        if size <= 0:
+            continue
+        # polynomial hash of each window, seeded with n so sizes do not collide
+        h = np.full(size, n, dtype=np.uint64)
+        for j in range(n):
+            h = h * _P + codes[j:j + size]
+        ok = seps[n:n + size] == seps[:size]
+        h = h[ok]
+        h = ((h ^ (h >> np.uint64(31))) * _MIX) >> np.uint64(64 - bits)
+        docs.append(owner[:size][ok])
+        buckets.append(h.astype(np.int64))
+    if not docs:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(docs).astype(np.int64), np.concatenate(buckets)
+
+
+def _idf(df: np.ndarray, n_docs: int) -> np.ndarray:
+    return np.log((1.0 + n_docs) / (1.0 + df)) + 1.0
+
+
+class SimilarityIndex:
+    def __init__(self, indptr: np.ndarray, rows: np.ndarray, weights: np.ndarray, n_docs: int, bits: int):
+        self.indptr = indptr
+        self.rows = rows
+        self.weights = weights
+        self.n_docs = n_docs
+        self.bits = bits
+
+    @staticmethod
+    def bits_for(schemes: Sequence[Dict]) -> int:
+        """Hash size for `schemes`: two to four buckets per n-gram occurrence (few enough
+        collisions to keep the rankings of the full-size table), within [MIN_BITS, BITS]."""
+        occurrences = sum(len(scheme_text(s)) + 2 for s in schemes) * len(NGRAMS)
+        return max(MIN_BITS, min(BITS, int(2 * occurrences).bit_length()))
+
+    @classmethod
+    def build(cls, schemes: Sequence[Dict], bits: Optional[int] = None) -> "SimilarityIndex":
+        n_docs = len(schemes)
+        bits = bits if bits is not None else cls.bits_for(schemes)
+        dim = 1 << bits
+        keys, counts = [], []
+        for start in range(0, n_docs, BUILD_CHUNK):
+            docs, buckets = _buckets([scheme_text(s) for s in schemes[start:start + BUILD_CHUNK]], bits)
+            # (scheme, bucket) pairs with their term frequency; chunks never share a scheme
+            k, c = np.unique(((docs + start) << bits) | buckets, return_counts=True)
+            keys.append(k)
+            counts.append(c)
+        key = np.concatenate(keys) if keys else np.zeros(0, dtype=np.int64)
+        tf = np.concatenate(counts) if counts else np.zeros(0, dtype=np.int64)
+        doc = key >> bits
+        term = key & (dim - 1)
+
+        df = np.bincount(term, minlength=dim)
+        keep = df[term] <= max(MAX_DF * n_docs, MIN_PRUNE_DF)
+        doc, term, tf = doc[keep], term[keep], tf[keep]
+        df = np.bincount(term, minlength=dim)
+
+        w = (1.0 + np.log(tf)) * _idf(df, n_docs)[term]
+        norms = np.sqrt(np.bincount(doc, weights=w * w, minlength=n_docs))
+        w /= norms[doc]
+        # term-major order; stable, so schemes stay ascending within a bucket
+        order = np.argsort(term, kind="stable")
+        indptr = np.zeros(dim + 1, dtype=np.int32 if len(term) < 2 ** 31 else np.int64)
+        np.cumsum(df, out=indptr[1:])
+        return cls(indptr, doc[order].astype(np.int32), w[order].astype(np.float32), n_docs, bits)
+
+    def save(self, path: Union[str, Path], digest: Optional[str] = None) -> None:
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        for name in _ARRAYS:
+            np.save(path / f"{name}.npy", getattr(self, name))
+        meta = {"format": FORMAT, "n_docs": self.n_docs, "bits": self.bits,
+                "ngrams": list(NGRAMS), "max_df": MAX_DF, "digest": digest}
+        # written last: a directory without meta.json is an unfinished build
+        (path / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+
+    @classmethod
+    def load(cls, path: Union[str, Path], mmap: bool = True) -> "SimilarityIndex":
+        path = Path(path)
+        meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+        if meta.get("format") != FORMAT or meta.get("ngrams") != list(NGRAMS):
+            raise ValueError(f"Similarity index at {path} was built with different settings")
+        arrays = {name: np.load(path / f"{name}.npy", mmap_mode="r" if mmap else None) for name in _ARRAYS}
+        return cls(n_docs=meta["n_docs"], bits=meta["bits"], **arrays)
+
+    def scores(self, text: str) -> np.ndarray:
+        """Cosine similarity of `text` to every scheme (float64 array, one entry per scheme)."""
+        _, buckets = _buckets([normalize(text)], self.bits)
+        terms, tf = np.unique(buckets, return_counts=True)
+        starts, ends = self.indptr[terms], self.indptr[terms + 1]
+        df = ends - starts
+        known = df > 0
+        if not known.any():
+            return np.zeros(self.n_docs)
+        terms, tf, starts, ends, df = terms[known], tf[known], starts[known], ends[known], df[known]
+        q = (1.0 + np.log(tf)) * _idf(df, self.n_docs)
+        q /= np.linalg.norm(q)
+        rows = np.concatenate([self.rows[a:b] for a, b in zip(starts, ends)])
+        w = np.concatenate([self.weights[a:b] * qi for a, b, qi in zip(starts, ends, q)])
+        return np.bincount(rows, weights=w, minlength=self.n_docs)
+
+    def top_k(self, text: str, k: int = 5, min_score: float = MIN_SCORE) -> List[Tuple[int, float]]:
+        """Up to k (position, score) pairs scoring at least `min_score`, best first (ties in
+        catalog order)."""
+        s = self.scores(text)
+        cand = np.flatnonzero(s >= max(min_score, 1e-12))
+        if len(cand) > k:
+            cand = cand[np.argpartition(-s[cand], k - 1)[:k]]
+        cand = cand[np.lexsort((cand, -s[cand]))]
+        return [(int(i), float(s[i])) for i in cand]
+
+
+def index_root(catalog_path: Union[str, Path]) -> Path:
+    """Directory holding the similarity indexes of the catalog at `catalog_path`."""
+    return INDEX_DIR if INDEX_DIR is not None else Path(catalog_path).parent / INDEX_DIR_NAME
+
+
+def index_path(digest: str, root: Union[str, Path]) -> Path:
+    return Path(root) / digest
+
+
+def load_or_build(schemes: Sequence[Dict], digest: str, root: Union[str, Path, None] = None) -> SimilarityIndex:
+    """The saved index for this catalog content, or a new one (saved for next time). With
+    no `root`, the index is only built in memory."""
+    if root is None:
+        return SimilarityIndex.build(schemes)
+    path = index_path(digest, root)
+    if (path / "meta.json").exists():
+        try:
+            index = SimilarityIndex.load(path)
+            if index.n_docs == len(schemes):
+                return index
+        except (OSError, ValueError) as e:
+            print(f"[Similarity] Rebuilding unreadable index {path}: {e}")
+    index = SimilarityIndex.build(schemes)
+    try:
+        index.save(path, digest)
+    except OSError as e:
+        print(f"[Similarity] Could not save index to {path}: {e}")
+    return index
+
+
+def for_snapshot(snap) -> SimilarityIndex:
+    """The similarity index of a catalog snapshot, loaded or built once per snapshot."""
+    root = index_root(snap.source) if snap.source is not None else INDEX_DIR
+    return snap.derived("similarity", lambda schemes: load_or_build(schemes, snap.digest, root))
@@ -0,0 +1,222 @@
+"""Lightweight per-turn instrumentation: timing spans and counters.
+
+Enable with `TRACE=1` (in-process aggregation only) or `TRACE_PATH=traces.jsonl` (also
+write one JSON line per conversation turn). When disabled, `span()` returns a shared
+no-op context manager and `incr()` returns immediately, so instrumented code pays
+about one global lookup per call.
+
+    with tracing.turn(user_id):
+        with tracing.span("planner"):
+            ...
+        tracing.incr("retrieval_hits", len(hits))
+
+`prometheus_snapshot()` renders the aggregated spans (as histograms) and counters in the
+Prometheus text exposition format.
+"""
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+
+TRACE_PATH = os.getenv("TRACE_PATH")
+ENABLED = bool(TRACE_PATH) or os.getenv("TRACE", "0") == "1"
+
+# Histogram bucket bounds in seconds
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Turn:
+    __slots__ = ("id", "user_id", "attrs", "t0", "wall", "spans", "counters", "_lock")
+
+    def __init__(self, user_id: Optional[str], attrs: Dict[str, Any]):
+        self.id = uuid.uuid4().hex[:12]
+        self.user_id = user_id
+        self.attrs = attrs
+        self.t0 = time.perf_counter()
+        self.wall = time.time()
+        self.spans: List[Dict[str, Any]] = []
+        self.counters: Dict[str, int] = {}
+        # spans may be recorded from TTS / LLM worker threads
+        self._lock = threading.Lock()
+
+    def add_span(self, name: str, start: float, seconds: float, error: Optional[str] = None) -> None:
+        rec = {"name": name, "start_ms": round((start - self.t0) * 1000, 3), "ms": round(seconds * 1000, 3)}
+        if error:
+            rec["error"] = error
+        with self._lock:
+            self.spans.append(rec)
+
+    def incr(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def to_dict(self, total: float) -> Dict[str, Any]:
+        with self._lock:
+            return {"turn_id": self.id, "user_id": self.user_id, "ts": self.wall, **self.attrs,
+                    "total_ms": round(total * 1000, 3), "spans": list(self.spans), "counters": dict(self.counters)}
+
+
+class Registry:
+    """Process-wide aggregation of span durations and counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hist: Dict[str, List[float]] = {}
+        self.sums: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+        self.counters: Dict[str, int] = {}
+
+    def observe(self, name: str, seconds: float) -> None:
+        with self._lock:
+            buckets = self.hist.get(name)
+            if buckets is None:
+                buckets = self.hist[name] = [0] * len(BUCKETS)
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    buckets[i] += 1
+            self.sums[name] = self.sums.get(name, 0.0) + seconds
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def incr(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def snapshot(self) -> str:
+        lines = [
+            "# HELP agent_stage_seconds Time spent per pipeline stage.",
+            "# TYPE agent_stage_seconds histogram",
+        ]
+        with self._lock:
+            for name in sorted(self.hist):
+                for bound, n in zip(BUCKETS, self.hist[name]):
+                    lines.append(f'agent_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {n}')
+                lines.append(f'agent_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {self.counts[name]}')
+                lines.append(f'agent_stage_seconds_sum{{stage="{name}"}} {self.sums[name]:.6f}')
+                lines.append(f'agent_stage_seconds_count{{stage="{name}"}} {self.counts[name]}')
+            lines.append("# HELP agent_events_total Pipeline event counters.")
+            lines.append("# TYPE agent_events_total counter")
+            for name in sorted(self.counters):
+                lines.append(f'agent_events_total{{event="{name}"}} {self.counters[name]}')
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+_current: ContextVar[Optional[Turn]] = ContextVar("trace_turn", default=None)
+_write_lock = threading.Lock()
+# Callables receiving every finished turn record (e.g. the load-test harness)
+_sinks: List[Callable[[Dict[str, Any]], None]] = []
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("name", "turn", "t0")
+
+    def __init__(self, name: str, turn: Optional[Turn]):
+        self.name = name
+        self.turn = turn
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.t0
+        error = exc_type.__name__ if exc_type is not None else None
+        if self.turn is not None:
+            self.turn.add_span(self.name, self.t0, seconds, error)
+        registry.observe(self.name, seconds)
+        if error:
+            registry.incr(f"{self.name}_errors")
+        return False
+
+
+def enable(path: Optional[str] = None) -> None:
+    """Turn tracing on at runtime (optionally writing turns to `path`)."""
+    global ENABLED, TRACE_PATH
+    ENABLED = True
+    if path:
+        TRACE_PATH = path
+
+
+def add_sink(fn: Callable[[Dict[str, Any]], None]) -> None:
+    """Also pass each finished turn record to `fn` (called on the thread ending the turn)."""
+    _sinks.append(fn)
+
+
+def current() -> Optional[Turn]:
+    return _current.get() if ENABLED else None
+
+
+def span(name: str, turn: Optional[Turn] = None):
+    """Time a block. Attributed to `turn`, or the turn active in this context."""
+    if not ENABLED:
+        return _NULL_SPAN
+    return _Span(name, turn if turn is not None else _current.get())
+
+
+def traced(name: str):
+    """Decorator: time every call of the function as span `name`."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            with _Span(name, _current.get()):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+def incr(name: str, n: int = 1, turn: Optional[Turn] = None) -> None:
+    if not ENABLED:
+        return
+    t = turn if turn is not None else _current.get()
+    if t is not None:
+        t.incr(name, n)
+    registry.incr(name, n)
+
+
+@contextmanager
+def turn(user_id: Optional[str] = None, **attrs):
+    """Scope of one conversation turn; emits its JSONL record on exit."""
+    if not ENABLED:
+        yield None
+        return
+    t = Turn(user_id, attrs)
+    token = _current.set(t)
+    try:
+        yield t
+    except BaseException as e:
+        t.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        _current.reset(token)
+        total = time.perf_counter() - t.t0
+        registry.observe("turn", total)
+        if TRACE_PATH or _sinks:
+            record = t.to_dict(total)
+            for sink in _sinks:
+                sink(record)
+            if TRACE_PATH:
+                line = json.dumps(record, ensure_ascii=False)
+                with _write_lock, open(TRACE_PATH, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+
+
+def prometheus_snapshot() -> str:
+    return registry.snapshot()
@@ -1,37 +1,286 @@
+import contextvars
+import hashlib
 import os
-import tempfile
+import re
 import shutil
-from gtts import gTTS
+import tempfile
+import threading
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+from . import tracing
+
+# Voice settings passed to gTTS; they are part of the cache key
+TLD = os.getenv("TTS_TLD", "com")
+SLOW = False
+
+CACHE_DIR = Path(os.getenv("TTS_CACHE_DIR", ".tts_cache"))
+CACHE_MAX_BYTES = int(float(os.getenv("TTS_CACHE_MAX_MB", "200")) * 1024 * 1024)
+
+# Speak sentence by sentence, synthesizing the next chunk while the current one plays
+STREAMING = os.getenv("TTS_STREAMING", "1") == "1"
+# How many synthesized chunks may wait ahead of playback, per utterance
+LOOKAHEAD = int(os.getenv("TTS_LOOKAHEAD", "2"))
+# Threads synthesizing chunks, shared by all callers
+SYNTH_WORKERS = int(os.getenv("TTS_SYNTH_WORKERS", "4"))
+
+# Sentence ends: ASCII terminators and the Devanagari danda / double danda
+_SENTENCE_RE = re.compile(r"(?<=[.!?\u0964\u0965])\s+|(?<=[\u0964\u0965])")
+
+
+class AudioCache:
+    """Content-addressed on-disk cache of synthesized mp3s with size-bounded LRU eviction.
+
+    Files are named by a hash of (text, lang, voice settings). Recency is tracked in memory
+    and mirrored to file mtimes, so the LRU order survives restarts.
+    """
+
+    def __init__(self, root: Path = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total = 0
+        self.hits = 0
+        self.misses = 0
+        self.root.mkdir(parents=True, exist_ok=True)
+        files = sorted(self.root.glob("*.mp3"), key=lambda p: p.stat().st_mtime)
+        for p in files:
+            size = p.stat().st_size
+            self._entries[p.stem] = size
+            self._total += size
+
+    @staticmethod
+    def key(text: str, lang: str, tld: str = TLD, slow: bool = SLOW) -> str:
+        raw = "\x00".join([text, lang, tld, str(slow)])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def path_for(self, key: str) -> Path:
+        return self.root / f"{key}.mp3"
+
+    def get(self, key: str) -> Optional[Path]:
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            path = self.path_for(key)
+            if not path.exists():
+                # removed behind our back
+                self._total -= self._entries.pop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+
+    def put(self, key: str, src: Path) -> Path:
+        dst = self.path_for(key)
+        # atomic rename so concurrent readers never see a partial file
+        os.replace(src, dst)
+        size = dst.stat().st_size
+        with self._lock:
+            self._total -= self._entries.pop(key, 0)
+            self._entries[key] = size
+            self._total += size
+            self._evict()
+        return dst
+
+    def _evict(self) -> None:
+        while self._total > self.max_bytes and len(self._entries) > 1:
+            old, size = self._entries.popitem(last=False)
+            self._total -= size
+            try:
+                self.path_for(old).unlink()
+            except OSError:
+                pass
+
+
+_cache: Optional[AudioCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> AudioCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = AudioCache()
+    return _cache
+
+
+def synthesize(text: str, lang: str = "mr") -> Path:
+    """Return the path of an mp3 for `text`, synthesizing it only on a cache miss."""
+    cache = get_cache()
+    key = AudioCache.key(text, lang)
+    path = cache.get(key)
+    if path is not None:
+        tracing.incr("tts_cache_hit")
+        return path
+    tracing.incr("tts_cache_miss")
+    fd, tmp = tempfile.mkstemp(suffix=".part", dir=str(cache.root))
+    os.close(fd)
+    try:
+        from gtts import gTTS  # imported on first synthesis, not for text-only runs
+        with tracing.span("tts_synth"):
+            gTTS(text=text, lang=lang, tld=TLD, slow=SLOW).save(tmp)
+        return cache.put(key, Path(tmp))
+    except Exception:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def presynthesize(texts: Iterable[str], lang: str = "mr") -> int:
+    """Synthesize fixed prompts ahead of time. Returns how many were newly synthesized.
+
+    With `TTS_STREAMING`, the sentence chunks are cached, since those are what `speak` plays.
+    """
+    cache = get_cache()
+    created = 0
+    if STREAMING:
+        texts = [c for text in texts for c in (split_sentences(text) or [text])]
+    for text in texts:
+        if cache.get(AudioCache.key(text, lang)) is not None:
+            continue
+        try:
+            synthesize(text, lang)
+            created += 1
+        except Exception as e:
+            print(f"[TTS] Pre-synthesis failed for '{text[:40]}': {e}")
+    return created
+
+
+@tracing.traced("tts_play")
+def play(path: Path, text: str = "") -> None:
+    # Prefer macOS afplay for playback (reliable and available on macOS) (I am Macbook M1 user)
+    afplay = shutil.which("afplay")
+    if afplay:
+        os.system(f"{afplay} \"{path}\"")
+    else:
+        # Fallback to playsound if afplay not available
+        try:
+            from playsound import playsound
+            playsound(str(path))
+        except Exception:
+            print("(TTS) Unable to play audio; printing text instead.")
+            print(text)
+
+
+def split_sentences(text: str) -> List[str]:
+    return [c.strip() for c in _SENTENCE_RE.split(text) if c and c.strip()]
+
+
+class SpeechStream:
+    """Pipelined TTS: a thread pool synthesizes sentence chunks ahead of playback.
+
+    Each call plays its own chunks in order in the calling thread, so a conversation
+    only waits for its own audio; the pool is shared and bounds concurrent synthesis.
+    Only the first sentence is on the critical path to the first audio.
+    """
+
+    def __init__(self, lookahead: int = LOOKAHEAD, workers: int = SYNTH_WORKERS):
+        self.lookahead = max(1, lookahead)
+        self.workers = max(1, workers)
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _executor(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    from concurrent.futures import ThreadPoolExecutor
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="tts-synth")
+        return self._pool
+
+    def _synthesize(self, chunk: str, lang: str, ctx: contextvars.Context) -> Optional[Path]:
+        try:
+            # pool threads do not inherit our context; run in the caller's so spans and
+            # cache counters are attributed to its trace turn
+            return ctx.run(synthesize, chunk, lang)
+        except Exception as e:
+            print(f"TTS failed: {e}")
+            return None
+
+    def speak(self, texts: Iterable[str], lang: str = "mr") -> None:
+        """Speak `texts` in order, returning once all of them have been played."""
+        chunks = [c for text in texts for c in (split_sentences(text) or [text])]
+        pool = self._executor()
+        ahead: "deque" = deque()
+        for chunk in chunks:
+            ahead.append((chunk, pool.submit(self._synthesize, chunk, lang, contextvars.copy_context())))
+            if len(ahead) > self.lookahead:
+                self._play_next(ahead)
+        while ahead:
+            self._play_next(ahead)
+
+    @staticmethod
+    def _play_next(ahead: "deque") -> None:
+        chunk, future = ahead.popleft()
+        path = future.result()
+        try:
+            if path is None:
+                print("Text output (Telugu):\n", chunk)
+            else:
+                play(path, chunk)
+        except Exception as e:
+            print(f"TTS playback failed: {e}")
+
+
+_stream: Optional[SpeechStream] = None
+
+
+def get_stream() -> SpeechStream:
+    global _stream
+    if _stream is None:
+        with _cache_lock:
+            if _stream is None:
+                _stream = SpeechStream()
+    return _stream
+
+
+def speak_all(texts: Iterable[str], lang: str = "mr") -> None:
+    """Speak several utterances back to back, synthesizing ahead of playback."""
+    texts = list(texts)
+    if not STREAMING:
+        for text in texts:
+            speak(text, lang)
+        return
+    for text in texts:
+        print(f"[TTS] Using language='{lang}' for text: {text[:60]}...")
+    get_stream().speak(texts, lang)
+
 
 def speak(text: str, lang: str = "mr") -> None:
     """Synthesize speech and play it.
 
+    Audio comes from the on-disk cache when the same text was spoken before; with
+    `TTS_STREAMING` enabled, long texts are spoken sentence by sentence.
     Uses macOS `afplay` when available for reliable playback. Falls back to printing text on failure.
     """
+    if STREAMING:
+        speak_all([text], lang)
+        return
     try:
         print(f"[TTS] Using language='{lang}' for text: {text[:60]}...")
-        tts = gTTS(text=text, lang=lang)
-        fd, path = tempfile.mkstemp(suffix=".mp3")
-        os.close(fd)
-        tts.save(path)
-
-        # Prefer macOS afplay for playback (reliable and available on macOS) (I am Macbook M1 user)
-        afplay = shutil.which("afplay")
-        if afplay:
-            os.system(f"{afplay} \"{path}\"")
-        else:
-            # Fallback to playsound if afplay not available
-            try:
-                from playsound import playsound
-                playsound(path)
-            except Exception:
-                print("(TTS) Unable to play audio; printing text instead.")
-                print(text)
-
-        try:
-            os.remove(path)
-        except Exception:
-            pass
+        path = synthesize(text, lang)
+        play(path, text)
     except Exception as e:
         print(f"TTS failed: {e}")
         print("Text output (Telugu):\n", text)
+
+
+async def speak_async(text: str, lang: str = "mr") -> None:
+    import asyncio  # already loaded by the running event loop
+    await asyncio.to_thread(speak, text, lang)
+
+
+async def speak_all_async(texts: Iterable[str], lang: str = "mr") -> None:
+    import asyncio
+    await asyncio.to_thread(speak_all, list(texts), lang)
@@ -0,0 +1 @@
+"""Benchmarks for the agent hot paths (see benchmarks/run.py)."""
@@ -0,0 +1,402 @@
+"""Load test: replay utterances through the async agent at a given concurrency and arrival rate.
+
+The OpenAI chat endpoint and the application API are replaced by local stand-in HTTP
+servers (run in a separate process) with configurable latency and error injection, so the
+test runs offline. Turns go through `app.agent_async` in this process; missing-field
+questions are answered from a synthetic profile and speech output is discarded. Per-stage
+timings come from `app.tracing`.
+
+The corpus is a JSONL file with one utterance per line under "text" (falling back to
+"utterance", "title" or "body"); plain text files are read line by line. Without a corpus,
+utterances are generated from the scheme catalog.
+
+Usage:
+    python -m benchmarks.load --corpus requests.jsonl --concurrency 50 --rate 20 --turns 2000 --out load.json
+    python -m benchmarks.load --standins-only   # serve the stand-ins for run_server.py
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing as mp
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from benchmarks import synthetic
+
+
+# ---------------------------------------------------------------------------
+# Stand-in servers
+
+class StandInHandler(BaseHTTPRequestHandler):
+    # set per server class by `_server`
+    latency = 0.0
+    jitter = 0.0
+    error_rate = 0.0
+    stats: Dict[str, int] = {}
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status: int, payload: Dict[str, Any]) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        delay = max(0.0, random.gauss(self.latency, self.jitter)) if self.jitter else self.latency
+        time.sleep(delay)
+        failed = random.random() < self.error_rate
+        with self.lock:
+            self.stats["requests"] = self.stats.get("requests", 0) + 1
+            if failed:
+                self.stats["injected_errors"] = self.stats.get("injected_errors", 0) + 1
+        if failed:
+            self._send(500, {"error": {"message": "injected error", "type": "server_error"}})
+            return
+        self.respond(payload)
+
+    def respond(self, payload: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+
+class ChatHandler(StandInHandler):
+    """POST /v1/chat/completions returning a plan built from the user's sentence."""
+
+    def respond(self, payload):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send(404, {"error": {"message": f"unknown path {self.path}"}})
+            return
+        prompt = payload["messages"][-1]["content"]
+        # prompts start with "<label>: <user sentence>\n\n"; keywords as in app.llm.fallback_plan
+        sentence = prompt.split("\n", 1)[0].split(":", 1)[-1].strip()
+        plan = {"action": "search_schemes", "keywords": [w for w in sentence.split() if len(w) > 3][:6]}
+        content = json.dumps(plan, ensure_ascii=False)
+        self._send(200, {
+            "id": "chatcmpl-" + uuid.uuid4().hex[:12],
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "stand-in"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        })
+
+
+class ApplyHandler(StandInHandler):
+    """POST /apply returning a submission like `app.tools.mock_api`."""
+
+    def respond(self, payload):
+        self._send(200, {
+            "application_id": str(uuid.uuid4()),
+            "status": "submitted",
+            "scheme_id": payload.get("scheme_id"),
+            "message": "దరఖాస్తు విజయవంతంగా సమర్పించబడింది",
+        })
+
+
+def _server(handler, latency: float, jitter: float, error_rate: float) -> ThreadingHTTPServer:
+    cls = type(handler.__name__, (handler,), {
+        "latency": latency, "jitter": jitter, "error_rate": error_rate, "stats": {}, "lock": threading.Lock(),
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", 0), cls)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def serve_standins(cfg: Dict[str, float], conn=None) -> None:
+    """Start both stand-ins and serve until told to stop over `conn` (or forever without one).
+
+    Runs in its own process and does not import `app`.
+    """
+    chat = _server(ChatHandler, cfg["llm_latency"], cfg["llm_jitter"], cfg["llm_error_rate"])
+    apply = _server(ApplyHandler, cfg["api_latency"], cfg["api_jitter"], cfg["api_error_rate"])
+    urls = {
+        "llm": f"http://127.0.0.1:{chat.server_address[1]}/v1",
+        "api": f"http://127.0.0.1:{apply.server_address[1]}",
+    }
+    if conn is None:
+        print(f"LLM_BASE_URL={urls['llm']}")
+        print(f"API_URL={urls['api']}", flush=True)
+        threading.Event().wait()
+    conn.send(urls)
+    conn.recv()
+    conn.send({"llm": dict(chat.RequestHandlerClass.stats), "api": dict(apply.RequestHandlerClass.stats)})
+
+
+class StandIns:
+    """Stand-in servers in a child process, so they do not compete with the agent for the GIL."""
+
+    def __init__(self, cfg: Dict[str, float]):
+        ctx = mp.get_context("spawn")
+        self._conn, child = ctx.Pipe()
+        self._proc = ctx.Process(target=serve_standins, args=(cfg, child), daemon=True)
+        self._proc.start()
+        child.close()
+        self.urls = self._conn.recv()
+
+    def close(self) -> Dict[str, Dict[str, int]]:
+        self._conn.send("stop")
+        stats = self._conn.recv()
+        self._proc.terminate()
+        self._proc.join()
+        return stats
+
+
+# ---------------------------------------------------------------------------
+# Corpus
+
+def load_corpus(path: str) -> List[str]:
+    texts = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                texts.append(line)
+                continue
+            if isinstance(rec, dict):
+                text = next((rec[k] for k in ("text", "utterance", "title", "body") if rec.get(k)), None)
+            else:
+                text = rec
+            if isinstance(text, str) and text.strip():
+                texts.append(text.strip())
+    if not texts:
+        raise ValueError(f"No utterances in {path}")
+    return texts
+
+
+def catalog_utterances(schemes: List[Dict], n: int, seed: int = 0) -> List[str]:
+    """Utterances made of a few words from a random scheme's name and description."""
+    rnd = random.Random(seed)
+    out = []
+    for _ in range(n):
+        s = rnd.choice(schemes)
+        words = (s.get("name", "") + " " + s.get("description", "")).split()
+        out.append(" ".join(rnd.sample(words, min(len(words), rnd.randint(2, 5)))))
+    return out
+
+
+# ---------------------------------------------------------------------------
+# Load generation
+
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"count": 0, "mean_ms": None, "p50_ms": None, "p90_ms": None, "p99_ms": None, "max_ms": None}
+    v = sorted(values)
+
+    def pct(p: float) -> float:
+        return round(v[min(len(v) - 1, int(p * len(v)))], 3)
+
+    return {
+        "count": len(v),
+        "mean_ms": round(sum(v) / len(v), 3),
+        "p50_ms": pct(0.50),
+        "p90_ms": pct(0.90),
+        "p99_ms": pct(0.99),
+        "max_ms": round(v[-1], 3),
+    }
+
+
+class Collector:
+    """Aggregates the trace records of finished turns."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages: Dict[str, List[float]] = {}
+        self.stage_errors: Dict[str, int] = {}
+        self.counters: Dict[str, int] = {}
+
+    def __call__(self, record: Dict[str, Any]) -> None:
+        with self._lock:
+            for span in record["spans"]:
+                self.stages.setdefault(span["name"], []).append(span["ms"])
+                if span.get("error"):
+                    self.stage_errors[span["name"]] = self.stage_errors.get(span["name"], 0) + 1
+            for name, n in record["counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + n
+
+    def report(self) -> Dict[str, Any]:
+        out = {}
+        for name in sorted(self.stages):
+            stats = percentiles(self.stages[name])
+            stats["errors"] = self.stage_errors.get(name, 0)
+            stats["error_rate"] = round(stats["errors"] / stats["count"], 4)
+            out[name] = stats
+        return out
+
+
+async def run_load(texts: List[str], turns: int, concurrency: int, rate: float,
+                   users: int, collector: Collector, seed: int = 0) -> Dict[str, Any]:
+    from app import agent_async
+
+    # the same executor setup as the server's lifespan
+    agent_async.configure_executor()
+    rnd = random.Random(seed)
+    profiles = [synthetic.make_user(rnd, complete=True) for _ in range(users)]
+    latencies: List[float] = []
+    waits: List[float] = []
+    errors: Dict[str, int] = {}
+    outputs = {"lines": 0}
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(i: int, arrival: float) -> None:
+        u = i % users
+
+        async def ask(field: str, prompt: str) -> str:
+            return str(profiles[u].get(field, 0))
+
+        async def say(lines: List[str]) -> None:
+            outputs["lines"] += len(lines)
+
+        async with sem:
+            start = time.perf_counter()
+            waits.append((start - arrival) * 1000)
+            try:
+                await agent_async.run_agent_on_text_async(texts[i % len(texts)], f"user_{u}", ask=ask, say=say)
+            except Exception as e:
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+            latencies.append((time.perf_counter() - arrival) * 1000)
+
+    t0 = time.perf_counter()
+    if rate > 0:
+        # open loop: Poisson arrivals, queueing behind the concurrency limit counts as latency
+        tasks = []
+        next_at = t0
+        for i in range(turns):
+            next_at += rnd.expovariate(rate)
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(one(i, next_at)))
+        await asyncio.gather(*tasks)
+    else:
+        # closed loop: `concurrency` callers issuing turns back to back
+        counter = iter(range(turns))
+
+        async def caller() -> None:
+            for i in counter:
+                await one(i, time.perf_counter())
+
+        await asyncio.gather(*(caller() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - t0
+
+    failed = sum(errors.values())
+    return {
+        "turns": turns,
+        "seconds": round(elapsed, 3),
+        "throughput_turns_s": round(turns / elapsed, 2) if elapsed else None,
+        "latency": percentiles(latencies),
+        "queue_wait": percentiles(waits),
+        "errors": errors,
+        "error_rate": round(failed / turns, 4) if turns else 0.0,
+        "lines_spoken": outputs["lines"],
+        "stages": collector.report(),
+        "counters": dict(sorted(collector.counters.items())),
+    }
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--corpus", help="JSONL/text file of utterances (e.g. requests.jsonl); default: generated from the catalog")
+    p.add_argument("--lang", default="te", help="Language code (mr or te)")
+    p.add_argument("--turns", type=int, default=500, help="Total turns to run")
+    p.add_argument("--concurrency", type=int, default=20, help="Maximum turns in flight")
+    p.add_argument("--rate", type=float, default=0.0, help="Arrival rate in turns/s (0: closed loop)")
+    p.add_argument("--users", type=int, default=100, help="Distinct user ids to spread turns over")
+    p.add_argument("--llm-latency", type=float, default=0.4, help="Stand-in LLM latency in seconds")
+    p.add_argument("--llm-jitter", type=float, default=0.1, help="Std deviation of the LLM latency")
+    p.add_argument("--llm-error-rate", type=float, default=0.0, help="Fraction of LLM requests answered with HTTP 500")
+    p.add_argument("--api-latency", type=float, default=0.5, help="Stand-in application API latency in seconds")
+    p.add_argument("--api-jitter", type=float, default=0.1, help="Std deviation of the API latency")
+    p.add_argument("--api-error-rate", type=float, default=0.0, help="Fraction of API requests answered with HTTP 500")
+    p.add_argument("--plan-cache", action="store_true", help="Keep the LLM plan cache on (default: every turn calls the LLM)")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--standins-only", action="store_true", help="Only run the stand-in servers and print their URLs")
+    p.add_argument("--out", help="Write the JSON report here (default: stdout)")
+    args = p.parse_args()
+
+    cfg = {
+        "llm_latency": args.llm_latency, "llm_jitter": args.llm_jitter, "llm_error_rate": args.llm_error_rate,
+        "api_latency": args.api_latency, "api_jitter": args.api_jitter, "api_error_rate": args.api_error_rate,
+    }
+    if args.standins_only:
+        serve_standins(cfg)
+        return
+
+    if args.corpus:
+        args.corpus = os.path.abspath(args.corpus)
+    if args.out:
+        args.out = os.path.abspath(args.out)
+    standins = StandIns(cfg)
+    tmp = tempfile.TemporaryDirectory()
+    # configure the agent before importing it: stand-in endpoints, throwaway memory store
+    os.environ.update({
+        "APP_LANG": args.lang,
+        "OPENAI_API_KEY": os.environ.get("LOAD_OPENAI_API_KEY", "sk-stand-in"),
+        "LLM_BASE_URL": standins.urls["llm"],
+        "API_URL": standins.urls["api"],
+        "LLM_CONCURRENCY": os.environ.get("LLM_CONCURRENCY", str(args.concurrency)),
+    })
+    os.environ.pop("PLAN_CACHE_PATH", None)
+    os.chdir(tmp.name)
+
+    from app import llm, tracing
+    from app.tools import retrieval
+
+    if not args.plan_cache:
+        llm.plan_cache = llm.PlanCache(max_size=0, path=None)
+    collector = Collector()
+    tracing.enable()
+    tracing.add_sink(collector)
+
+    schemes = retrieval.get_catalog(lang=args.lang).schemes
+    texts = load_corpus(args.corpus) if args.corpus else catalog_utterances(schemes, max(args.turns, 1), args.seed)
+
+    # the agent logs every step with print; keep the report readable
+    stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+    loop = asyncio.new_event_loop()
+    try:
+        result = loop.run_until_complete(
+            run_load(texts, args.turns, args.concurrency, args.rate, args.users, collector, args.seed)
+        )
+    finally:
+        loop.close()
+        sys.stdout = stdout
+        served = standins.close()
+        tmp.cleanup()
+
+    report = {
+        "config": {**vars(args), "corpus_size": len(texts)},
+        "standins": served,
+        "result": result,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        Path(args.out).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+"""Benchmark the hot paths and report throughput, p50/p99 latency and peak RSS as JSON.
+
+Each case runs in a fresh process so its peak RSS is its own. STT, the LLM planner and
+TTS are replaced by local stubs for the end-to-end turn, so results do not depend on the
+network. Compare two commits by running the same command on each and diffing the JSON.
+
+Usage:
+    python -m benchmarks.run --sizes 100,10000,1000000 --users 1000000 --turns 1000000 --out bench.json
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from benchmarks import synthetic
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def measure(fn: Callable[[int], Any], ops: int) -> Dict[str, float]:
+    """Call fn(i) `ops` times and summarise per-call latency."""
+    lat: List[float] = []
+    start = time.perf_counter()
+    for i in range(ops):
+        t0 = time.perf_counter()
+        fn(i)
+        lat.append(time.perf_counter() - t0)
+    total = time.perf_counter() - start
+    lat.sort()
+
+    def pct(p: float) -> float:
+        return round(lat[min(len(lat) - 1, int(p * len(lat)))] * 1000, 4)
+
+    return {
+        "ops": ops,
+        "seconds": round(total, 4),
+        "throughput_ops_s": round(ops / total, 1) if total else None,
+        "p50_ms": pct(0.50),
+        "p99_ms": pct(0.99),
+    }
+
+
+def _keyword_sets(lang: str, n: int) -> List[List[str]]:
+    from app.llm import fallback_plan
+    return [fallback_plan(u)["keywords"] for u in synthetic.make_utterances(n, lang, seed=1)]
+
+
+def bench_retrieval(size: int, lang: str, ops: int, tmp: str) -> Dict[str, Any]:
+    from app.tools import retrieval
+    schemes = synthetic.make_schemes(size, lang)
+    t0 = time.perf_counter()
+    index = retrieval.build_index(schemes)
+    build = time.perf_counter() - t0
+    kws = _keyword_sets(lang, ops)
+    out = measure(lambda i: retrieval.find_schemes_by_keywords(kws[i], index=index), ops)
+    out["index_build_s"] = round(build, 3)
+    return out
+
+
+def bench_similarity(size: int, lang: str, ops: int, tmp: str) -> Dict[str, Any]:
+    from app.tools import similarity
+    schemes = synthetic.make_schemes(size, lang)
+    t0 = time.perf_counter()
+    similarity.SimilarityIndex.build(schemes).save(Path(tmp) / "similarity")
+    build = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    index = similarity.SimilarityIndex.load(Path(tmp) / "similarity")
+    load = time.perf_counter() - t0
+    texts = synthetic.make_utterances(ops, lang, seed=1)
+    out = measure(lambda i: index.top_k(texts[i], 10), ops)
+    out["index_build_s"] = round(build, 3)
+    out["index_load_s"] = round(load, 4)
+    return out
+
+
+def bench_catalog(size: int, lang: str, ops: int, tmp: str) -> Dict[str, Any]:
+    """Startup of a JSON catalog (parse + index build) vs its compiled, memory-mapped form."""
+    import hashlib
+    import itertools
+    from app.tools import catalog_file, retrieval
+    path = synthetic.write_schemes(Path(tmp) / "schemes.json", size, lang)
+    t0 = time.perf_counter()
+    retrieval.SchemeCatalog(path)
+    json_open = time.perf_counter() - t0
+    raw = path.read_bytes()
+    t0 = time.perf_counter()
+    catalog_file.write(json.loads(raw.decode("utf-8")), Path(tmp) / "schemes.catalog",
+                       digest=hashlib.sha1(raw).hexdigest())
+    compile_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    snap = retrieval.SchemeCatalog(Path(tmp) / "schemes.catalog").snapshot()
+    compiled_open = time.perf_counter() - t0
+    kws = _keyword_sets(lang, ops)
+    out = measure(lambda i: list(itertools.islice(snap.index.iter_ranked(kws[i]), 8)), ops)
+    out.update(json_open_s=round(json_open, 3), compile_s=round(compile_s, 3),
+               compiled_open_s=round(compiled_open, 4), file_mb=round((Path(tmp) / "schemes.catalog").stat().st_size / 1e6, 1))
+    return out
+
+
+def bench_eligibility(size: int, lang: str, ops: int, tmp: str) -> Dict[str, Any]:
+    from app.tools import eligibility
+    schemes = synthetic.make_schemes(size, lang)
+    rnd = random.Random(2)
+    users = [synthetic.make_user(rnd) for _ in range(ops)]
+    # one op = one (user, scheme) check
+    n = len(schemes)
+    return measure(lambda i: eligibility.check_eligibility(users[i], schemes[i % n]), ops)
+
+
+def bench_eligibility_matrix(size: int, lang: str, ops: int, tmp: str) -> Dict[str, Any]:
+    from app.tools import rule_matrix
+    schemes = synthetic.make_schemes(size, lang)
+    t0 = time.perf_counter()
+    rules = rule_matrix.compile_rules(schemes)
+    build = time.perf_counter() - t0
+    rnd = random.Random(2)
+    users = [synthetic.make_user(rnd) for _ in range(ops)]
+    # one op = one user against the whole catalog
+    out = measure(lambda i: rules.evaluate_masks(users[i]), ops)
+    out["compile_s"] = round(build, 3)
+    return out
+
+
+def _memory(backend: str, users: int, turns: int, tmp: str):
+    from app.memory import Memory, make_backend
+    t0 = time.perf_counter()
+    if backend == "sqlite":
+        synthetic.fill_sqlite_memory(Path(tmp) / "memory.db", users, turns)
+    else:
+        synthetic.fill_json_memory(Path(tmp) / "memory.json", users, turns)
+    fill = time.perf_counter() - t0
+    return Memory(Path(tmp) / "memory.json", backend=make_backend(Path(tmp) / "memory.json", backend)), fill
+
+
+def bench_memory(backend: str, users: int, turns: int, ops: int, tmp: str) -> Dict[str, Any]:
+    mem, fill = _memory(backend, users, turns, tmp)
+    rnd = random.Random(3)
+    ids = [f"user_{rnd.randrange(max(users, 1))}" for _ in range(ops)]
+    profile = synthetic.make_user(rnd, complete=True)
+    return {
+        "fill_s": round(fill, 3),
+        "get_user": measure(lambda i: mem.get_user(ids[i]), ops),
+        "save_user": measure(lambda i: mem.save_user(ids[i], profile), ops),
+        "add_conversation": measure(lambda i: mem.add_conversation({"user_id": ids[i], "text": "bench"}), ops),
+        "get_history": measure(lambda i: mem.get_history(ids[i], 20), ops),
+    }
+
+
+def bench_turn(size: int, lang: str, ops: int, tmp: str) -> Dict[str, Any]:
+    from app import agent, llm
+    from app.memory import Memory
+    from app.tools import retrieval, mock_api
+
+    # local stubs: heuristic planner instead of the LLM, no audio, no API latency
+    agent.llm.plan_with_llm = lambda text, lang="mr", **kw: llm.fallback_plan(text)
+    agent.speak = lambda text, lang="mr": None
+    agent.speak_all = lambda texts, lang="mr": None
+    mock_api.LATENCY = 0
+    path = synthetic.write_schemes(Path(tmp) / "schemes.json", size, lang)
+    retrieval.DEFAULT_SCHEMES[lang] = path
+    retrieval.get_catalog(lang=lang)
+    mem = Memory(Path(tmp) / "memory.json")
+    agent.set_memory(mem)
+    rnd = random.Random(4)
+    for u in range(100):
+        mem.save_user(f"user_{u}", synthetic.make_user(rnd, complete=True))
+    texts = synthetic.make_utterances(ops, lang, seed=5)
+    return measure(lambda i: agent.run_agent_on_text(texts[i], user_id=f"user_{i % 100}", lang=lang), ops)
+
+
+CASES = {
+    "retrieval": bench_retrieval,
+    "similarity": bench_similarity,
+    "catalog": bench_catalog,
+    "eligibility": bench_eligibility,
+    "eligibility_matrix": bench_eligibility_matrix,
+    "memory": bench_memory,
+    "turn": bench_turn,
+}
+
+
+def _child(name: str, kwargs: Dict[str, Any], conn) -> None:
+    devnull = open(os.devnull, "w")
+    # the agent logs every step with print; keep the benchmark output clean
+    sys.stdout = devnull
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            out = CASES[name](tmp=tmp, **kwargs)
+        out["peak_rss_mb"] = peak_rss_mb()
+        conn.send(out)
+    except Exception as e:
+        conn.send({"error": repr(e)})
+    finally:
+        conn.close()
+
+
+def run_case(name: str, **kwargs) -> Dict[str, Any]:
+    ctx = mp.get_context("spawn")
+    parent, child = ctx.Pipe(duplex=False)
+    proc = ctx.Process(target=_child, args=(name, kwargs, child))
+    proc.start()
+    child.close()
+    result = parent.recv()
+    proc.join()
+    record = {"case": name, "params": kwargs}
+    record.update(result)
+    print(f"[Bench] {name} {kwargs}: {result}", file=sys.stderr)
+    return record
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=ROOT, text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return ""
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--sizes", default="100,1000,10000", help="Comma-separated catalog sizes")
+    p.add_argument("--lang", default="te", help="Language code (mr or te)")
+    p.add_argument("--users", type=int, default=10000, help="Users in the synthetic memory store")
+    p.add_argument("--turns", type=int, default=100000, help="Conversation turns in the synthetic memory store")
+    p.add_argument("--json-max", type=int, default=100000, help="Skip the JSON memory backend above this many turns")
+    p.add_argument("--ops", type=int, default=1000, help="Operations per micro-benchmark")
+    p.add_argument("--turn-ops", type=int, default=200, help="Agent turns per end-to-end benchmark")
+    p.add_argument("--cases", default=",".join(CASES), help="Comma-separated subset of: " + ", ".join(CASES))
+    p.add_argument("--out", help="Write the JSON report here (default: stdout)")
+    args = p.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    cases = set(args.cases.split(","))
+    results = []
+    for size in sizes:
+        if "retrieval" in cases:
+            results.append(run_case("retrieval", size=size, lang=args.lang, ops=args.ops))
+        if "similarity" in cases:
+            results.append(run_case("similarity", size=size, lang=args.lang, ops=args.ops))
+        if "catalog" in cases:
+            results.append(run_case("catalog", size=size, lang=args.lang, ops=min(args.ops, 200)))
+        if "eligibility" in cases:
+            results.append(run_case("eligibility", size=size, lang=args.lang, ops=args.ops))
+        if "eligibility_matrix" in cases:
+            results.append(run_case("eligibility_matrix", size=size, lang=args.lang, ops=min(args.ops, 200)))
+        if "turn" in cases:
+            results.append(run_case("turn", size=size, lang=args.lang, ops=args.turn_ops))
+    if "memory" in cases:
+        results.append(run_case("memory", backend="sqlite", users=args.users, turns=args.turns, ops=args.ops))
+        if args.turns <= args.json_max:
+            results.append(run_case("memory", backend="json", users=args.users, turns=args.turns, ops=min(args.ops, 50)))
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        Path(args.out).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Synthetic data for benchmarks: Telugu/Marathi scheme catalogs and memory stores."""
+import json
+import random
+from pathlib import Path
+from typing import Dict, List, Union
+
+WORDS = {
+    "te": [
+        "రైతు", "సహాయం", "పథకం", "పంట", "బియ్యం", "సాగు", "తల్లి", "శిక్షణ", "ఆర్థిక", "కుటుంబం",
+        "ఆరోగ్య", "బీమా", "విద్య", "గృహ", "నీటి", "పెన్షన్", "వృద్ధుల", "మహిళా", "యువత", "ఉపాధి",
+        "రుణం", "విత్తనాలు", "ఎరువులు", "పశువుల", "చేనేత", "మత్స్య", "గ్రామీణ", "పట్టణ", "విద్యుత్", "రహదారి",
+    ],
+    "mr": [
+        "शेतकरी", "सहाय्य", "योजना", "पीक", "बीज", "पेरणी", "माता", "प्रशिक्षण", "आर्थिक", "कुटुंब",
+        "आरोग्य", "विमा", "शिक्षण", "घरकुल", "पाणी", "निवृत्तीवेतन", "वृद्ध", "महिला", "युवा", "रोजगार",
+        "कर्ज", "बियाणे", "खते", "पशुधन", "हातमाग", "मत्स्य", "ग्रामीण", "शहरी", "वीज", "रस्ते",
+    ],
+}
+SUFFIX = {"te": "పథకం", "mr": "योजना"}
+
+
+def make_schemes(n: int, lang: str = "te", seed: int = 0) -> List[Dict]:
+    rnd = random.Random(seed)
+    words = WORDS[lang]
+    schemes = []
+    for i in range(n):
+        name = " ".join(rnd.sample(words, 2) + [SUFFIX[lang]])
+        desc = " ".join(rnd.choice(words) for _ in range(rnd.randint(6, 14)))
+        rules: Dict = {}
+        if rnd.random() < 0.6:
+            rules["min_age"] = rnd.choice([18, 21, 25, 40, 60])
+            rules["max_age"] = rules["min_age"] + rnd.choice([20, 30, 40])
+        if rnd.random() < 0.5:
+            rules["income_below"] = rnd.choice([100000, 250000, 500000])
+        if rnd.random() < 0.3:
+            rules["farmer"] = True
+            rules["land_size_max"] = rnd.choice([2, 5, 10])
+        if rnd.random() < 0.5:
+            rules["requires_residency"] = True
+        schemes.append({
+            "id": f"bench_{lang}_{i:07d}",
+            "name": f"{name} {i}",
+            "description": desc,
+            "eligibility": rules,
+            "application_url": f"https://mockgov.example/apply/bench_{lang}_{i:07d}",
+        })
+    return schemes
+
+
+def write_schemes(path: Union[str, Path], n: int, lang: str = "te", seed: int = 0) -> Path:
+    p = Path(path)
+    with open(p, "w", encoding="utf-8") as f:
+        json.dump(make_schemes(n, lang, seed), f, ensure_ascii=False)
+    return p
+
+
+def make_user(rnd: random.Random, complete: bool = False) -> Dict:
+    user: Dict = {}
+    if complete or rnd.random() < 0.8:
+        user["age"] = rnd.randint(16, 85)
+    if complete or rnd.random() < 0.7:
+        user["annual_income"] = rnd.randrange(20000, 800000, 1000)
+    user["farmer"] = rnd.random() < 0.4
+    if complete or (user["farmer"] and rnd.random() < 0.7):
+        user["land_size"] = round(rnd.uniform(0.5, 12), 1)
+    return user
+
+
+def make_utterances(n: int, lang: str = "te", seed: int = 0) -> List[str]:
+    rnd = random.Random(seed)
+    words = WORDS[lang]
+    return [" ".join(rnd.choice(words) for _ in range(rnd.randint(3, 8))) for _ in range(n)]
+
+
+def fill_sqlite_memory(db_path: Union[str, Path], users: int, turns: int, lang: str = "te",
+                       seed: int = 0, batch: int = 50000) -> Path:
+    """Create a SQLite memory store (same schema as app.memory.SQLiteBackend) in bulk."""
+    from app.memory import SQLiteBackend
+    rnd = random.Random(seed)
+    backend = SQLiteBackend(Path(db_path))
+    conn = backend.conn
+    texts = make_utterances(1000, lang, seed)
+    conn.execute("BEGIN")
+    for start in range(0, users, batch):
+        conn.executemany(
+            "INSERT OR REPLACE INTO users (user_id, info) VALUES (?, ?)",
+            [(f"user_{i}", json.dumps(make_user(rnd))) for i in range(start, min(users, start + batch))],
+        )
+    for start in range(0, turns, batch):
+        rows = []
+        for _ in range(start, min(turns, start + batch)):
+            uid = f"user_{rnd.randrange(max(users, 1))}"
+            rows.append((uid, json.dumps({"user_id": uid, "text": rnd.choice(texts)}, ensure_ascii=False)))
+        conn.executemany("INSERT INTO conversations (user_id, turn) VALUES (?, ?)", rows)
+    conn.execute("COMMIT")
+    conn.close()
+    return Path(db_path)
+
+
+def fill_json_memory(path: Union[str, Path], users: int, turns: int, lang: str = "te", seed: int = 0) -> Path:
+    """Create a legacy memory.json with the given number of users and turns."""
+    rnd = random.Random(seed)
+    texts = make_utterances(1000, lang, seed)
+    data = {
+        "users": {f"user_{i}": make_user(rnd) for i in range(users)},
+        "conversations": [],
+    }
+    for _ in range(turns):
+        uid = f"user_{rnd.randrange(max(users, 1))}"
+        data["conversations"].append({"user_id": uid, "text": rnd.choice(texts)})
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    return Path(path)
@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+"""Transcribe a directory or manifest of recordings into a JSONL file.
+
+Example:
+    python run_batch_stt.py samples/ --out transcripts.jsonl --lang te --workers 4
+"""
+import argparse
+
+from app.stt_batch import transcribe_batch
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("source", help="Directory of audio files, or a manifest (one path per line or JSONL with 'path'/'lang')")
+    p.add_argument("--out", default="transcripts.jsonl", help="Output JSONL file")
+    p.add_argument("--lang", help="Language code (mr or te)", default="te")
+    p.add_argument("--workers", type=int, default=2, help="Worker processes (each holds one model)")
+    p.add_argument("--model", help="Whisper model size (default: WHISPER_MODEL or 'small')")
+    p.add_argument("--no-resume", action="store_true", help="Overwrite the output instead of resuming it")
+    args = p.parse_args()
+
+    transcribe_batch(args.source, args.out, lang=args.lang, workers=args.workers,
+                     model_name=args.model, resume=not args.no_resume)
+
+
+if __name__ == "__main__":
+    main()
@@ -17,15 +17,11 @@ def main():
     args = p.parse_args()
     args = p.parse_args()
 
-    # set language for this run
-    import os
-    os.environ["APP_LANG"] = args.lang
-
     mem = Memory()
     # Pre-fill user profile so agent won't ask for missing fields
     mem.save_user("user_1", {"age": args.age, "annual_income": args.income, "farmer": args.farmer})
 
-    run_agent_on_text(args.text, user_id="user_1")
+    run_agent_on_text(args.text, user_id="user_1", lang=args.lang)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""Find stored users who qualify (or are close to qualifying) for given schemes.
+
+Examples:
+    # screen everyone against two schemes from the Telugu catalog
+    python run_screening.py --lang te --scheme scheme_01_te --scheme scheme_02_te --out screening/
+    # screen against a file of new schemes, keeping users at most one field away
+    python run_screening.py --schemes new_schemes.json --max-missing 1
+"""
+import argparse
+
+from app.memory import Memory
+from app.screening import screen_users, select_schemes
+from app.tools import retrieval
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--lang", help="Language code (mr or te)", default="te")
+    p.add_argument("--schemes", help="Schemes JSON file (default: the catalog for --lang)")
+    p.add_argument("--scheme", action="append", dest="ids", help="Scheme id to screen for (repeatable; default: all)")
+    p.add_argument("--out", default="screening", help="Output directory")
+    p.add_argument("--chunk", type=int, default=10000, help="Users per batch")
+    p.add_argument("--max-missing", type=int, help="Only report users missing at most this many fields")
+    args = p.parse_args()
+
+    path = args.schemes or retrieval.schemes_path(args.lang)
+    schemes = select_schemes(retrieval.load_schemes(path), args.ids)
+    screen_users(schemes, Memory(), args.out, chunk_size=args.chunk, max_missing=args.max_missing)
+
+
+if __name__ == "__main__":
+    main()
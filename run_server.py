@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""Serve the agent over HTTP (see app/server.py for the endpoints).
+
+Example:
+    python run_server.py --lang te --port 8000 --workers 4
+"""
+import argparse
+import os
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--host", default="0.0.0.0")
+    p.add_argument("--port", type=int, default=8000)
+    p.add_argument("--workers", type=int, default=1, help="Worker processes")
+    p.add_argument("--lang", help="Default language for requests without one (mr or te)", default="te")
+    p.add_argument("--langs", help="Comma-separated languages to preload (default: all supported)")
+    p.add_argument("--preload-stt", action="store_true", help="Load the Whisper model in each worker at startup")
+    p.add_argument("--warm-tts", action="store_true", help="Pre-synthesize fixed prompts at startup")
+    p.add_argument("--threads", type=int, help="Threads per worker for blocking steps (default: AGENT_THREADS or 64)")
+    args = p.parse_args()
+
+    # workers import the app themselves, so configure them through the environment
+    os.environ["APP_LANG"] = args.lang
+    if args.langs:
+        os.environ["SERVER_LANGS"] = args.langs
+    if args.preload_stt:
+        os.environ["SERVER_PRELOAD_STT"] = "1"
+    if args.warm_tts:
+        os.environ["SERVER_WARM_TTS"] = "1"
+    if args.threads:
+        os.environ["AGENT_THREADS"] = str(args.threads)
+
+    import uvicorn
+    uvicorn.run("app.server:app", host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
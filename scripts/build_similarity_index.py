@@ -0,0 +1,51 @@
+"""Build the TF-IDF similarity index of a schemes catalog ahead of time.
+
+The index is written to <out>/<sha1 of the catalog file>/ (default out: .similarity_index
+next to the catalog, or SIMILARITY_INDEX_DIR), where the agent finds it by content hash and memory-maps it instead of building it on the first search. Rebuild after
+editing the catalog (an outdated index is simply not used).
+
+Usage:
+    python scripts/build_similarity_index.py --lang te [--out DIR] [--query "..."]
+"""
+import argparse
+import hashlib
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.tools import retrieval, similarity
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--lang", default="mr", help="Language code (mr or te)")
+    p.add_argument("--schemes", help="Catalog file (default: the catalog for --lang)")
+    p.add_argument("--out", help="Index root directory (default: .similarity_index next to the catalog)")
+    p.add_argument("--query", help="Print the top matches for this text after building")
+    p.add_argument("--top", type=int, default=5)
+    args = p.parse_args()
+
+    path = Path(args.schemes) if args.schemes else retrieval.schemes_path(args.lang)
+    raw = path.read_bytes()
+    # same hash as the catalog snapshot, so the runtime finds this index
+    digest = hashlib.sha1(raw).hexdigest()
+    schemes = json.loads(raw.decode("utf-8"))
+
+    t0 = time.perf_counter()
+    index = similarity.SimilarityIndex.build(schemes)
+    out = similarity.index_path(digest, args.out or similarity.index_root(path))
+    index.save(out, digest)
+    size = sum(f.stat().st_size for f in out.iterdir()) / 1e6
+    print(f"Indexed {len(schemes)} schemes in {time.perf_counter() - t0:.1f}s -> {out} ({size:.1f} MB)")
+
+    if args.query:
+        index = similarity.SimilarityIndex.load(out)
+        for i, score in index.top_k(args.query, args.top, min_score=0.0):
+            print(f"{score:.3f}  {schemes[i].get('id')}  {schemes[i].get('name')}")
+
+
+if __name__ == "__main__":
+    main()
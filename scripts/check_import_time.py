@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""Import-time budget check for the app package.
+
+Imports each entry module in a fresh interpreter (`python -X importtime`), takes the best
+of several runs and fails if it exceeds its budget or if importing it loaded one of the
+heavy dependencies that must only load on first use (gTTS, Whisper, OpenAI, dotenv,
+NumPy). Exits non-zero on failure, so it can run in CI.
+
+Example:
+    python scripts/check_import_time.py --runs 5
+"""
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Cumulative import time allowed per module, in milliseconds
+BUDGETS_MS = {
+    "app": 5,
+    "app.tools": 5,
+    "app.memory": 25,
+    "app.llm": 40,
+    "app.agent": 60,
+    # asyncio alone costs 20-40 ms
+    "app.agent_async": 100,
+}
+
+DEFERRED = ("gtts", "whisper", "openai", "dotenv", "numpy", "torch")
+
+
+def import_ms(module: str) -> float:
+    env = dict(os.environ, PYTHONPATH=str(ROOT))
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    ).stderr
+    for line in reversed(out.splitlines()):
+        # "import time:  self [us] | cumulative | name"
+        parts = [p.strip() for p in line.split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1]) / 1000
+    raise RuntimeError(f"No import time reported for {module}")
+
+
+def loaded_heavy(module: str) -> list:
+    code = f"import sys, {module}; print(' '.join(m for m in {DEFERRED!r} if m in sys.modules))"
+    env = dict(os.environ, PYTHONPATH=str(ROOT))
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    return out.split()
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--runs", type=int, default=3, help="Fresh interpreters per module; the best run counts")
+    p.add_argument("--scale", type=float, default=1.0, help="Multiply all budgets (slow machines)")
+    args = p.parse_args()
+
+    # compile bytecode first so the first run does not pay for it
+    subprocess.run([sys.executable, "-m", "compileall", "-q", str(ROOT / "app")], check=True)
+    failed = False
+    for module, budget in BUDGETS_MS.items():
+        ms = min(import_ms(module) for _ in range(max(1, args.runs)))
+        heavy = loaded_heavy(module)
+        ok = ms <= budget * args.scale and not heavy
+        failed |= not ok
+        note = f" loaded {', '.join(heavy)}" if heavy else ""
+        print(f"[Import] {'ok  ' if ok else 'FAIL'} {module:<16} {ms:7.1f} ms (budget {budget * args.scale:.0f} ms){note}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
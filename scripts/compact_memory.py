@@ -0,0 +1,34 @@
+"""Apply the history retention limits to every user in the memory store.
+
+The agent compacts users it has written to in the background; run this once after
+changing the limits, or for stores that grew before retention existed.
+
+Usage:
+    python scripts/compact_memory.py [--path memory.json] [--max-turns 200] [--max-age-days 90]
+"""
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.memory import HISTORY_MAX_AGE_DAYS, HISTORY_MAX_TURNS, Memory
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--path", default="memory.json", help="Memory path (the SQLite store is <path>.db)")
+    p.add_argument("--max-turns", type=int, default=HISTORY_MAX_TURNS, help="Turns kept per user")
+    p.add_argument("--max-age-days", type=float, default=HISTORY_MAX_AGE_DAYS, help="Fold older turns (0: no limit)")
+    p.add_argument("--chunk", type=int, default=10000, help="Users per pass")
+    args = p.parse_args()
+
+    mem = Memory(Path(args.path), max_turns=args.max_turns, max_age_days=args.max_age_days, compact_interval=0)
+    total = 0
+    for chunk in mem.iter_history_users(args.chunk):
+        total += mem.compact(chunk)
+    print(f"Folded {total} turns into summaries")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Compile a schemes JSON catalog into the memory-mapped `.catalog` format.
+
+The output goes next to the JSON (schemes_te.json -> schemes_te.catalog) unless --out is
+given. The agent then maps it instead of parsing the JSON and building indexes at
+startup, as long as the JSON is not modified afterwards; recompile after every edit.
+
+Usage:
+    python scripts/compile_catalog.py --lang te
+    python scripts/compile_catalog.py --schemes big_catalog.json --out big.catalog
+"""
+import argparse
+import hashlib
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.tools import catalog_file, retrieval
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--lang", default="mr", help="Language code (mr or te)")
+    p.add_argument("--schemes", help="Catalog JSON (default: the catalog for --lang)")
+    p.add_argument("--out", help="Output file (default: the JSON path with a .catalog suffix)")
+    p.add_argument("--no-similarity", action="store_true", help="Leave out the TF-IDF similarity index")
+    args = p.parse_args()
+
+    src = Path(args.schemes) if args.schemes else retrieval.schemes_path(args.lang)
+    out = Path(args.out) if args.out else catalog_file.compiled_path(src)
+    st = src.stat()
+    raw = src.read_bytes()
+    schemes = json.loads(raw.decode("utf-8"))
+
+    t0 = time.perf_counter()
+    header = catalog_file.write(schemes, out, digest=hashlib.sha1(raw).hexdigest(),
+                                source_stamp=(st.st_mtime_ns, st.st_size),
+                                similarity=not args.no_similarity)
+    took = time.perf_counter() - t0
+    print(f"Compiled {header['count']} schemes in {took:.1f}s -> {out} ({out.stat().st_size / 1e6:.1f} MB)")
+
+    t0 = time.perf_counter()
+    retrieval.SchemeCatalog(out)
+    print(f"Opened in {(time.perf_counter() - t0) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
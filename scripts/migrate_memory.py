@@ -0,0 +1,37 @@
+"""Migrate a legacy memory.json into the SQLite memory store.
+
+The agent does this automatically the first time it opens the SQLite backend; this script
+lets operators run the import ahead of time (e.g. before rolling out new workers).
+
+Usage:
+    python scripts/migrate_memory.py [--src memory.json] [--db memory.db]
+"""
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.memory import SQLiteBackend
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--src", default="memory.json", help="Legacy JSON memory file")
+    p.add_argument("--db", help="Target SQLite file (default: <src> with .db suffix)")
+    args = p.parse_args()
+
+    src = Path(args.src)
+    if not src.exists():
+        print(f"Nothing to migrate: {src} not found")
+        return
+    db = Path(args.db) if args.db else src.with_suffix(".db")
+    backend = SQLiteBackend(db)
+    if backend.import_json(src):
+        print(f"Migrated {src} into {db}")
+    else:
+        print(f"{src} was already migrated into {db}")
+
+
+if __name__ == "__main__":
+    main()